@@ -1,4 +1,6 @@
-from accounts.models import CompanyUser
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from accounts.utils import get_user_role, get_layout_version
 
 def user_context(request):
 
@@ -6,10 +8,10 @@ def user_context(request):
     user_role = None
 
     if request.user.is_authenticated and company_id:
-        try:
-            company_user = CompanyUser.objects.get(user=request.user,company_id=company_id,status='Approved')
-            user_role = company_user.role
-        except CompanyUser.DoesNotExist:
-            user_role = None
+        user_role = get_user_role(request, company_id)
 
-    return {'user_role': user_role,'company_id': company_id}
+    # a new collectstatic changes the fingerprinted names inside the fragments
+    layout_version = '%s.%s' % (get_layout_version(company_id), getattr(staticfiles_storage, 'manifest_hash', ''))
+
+    return {'user_role': user_role,'company_id': company_id,
+            'layout_version': layout_version, 'layout_cache_timeout': settings.LAYOUT_CACHE_TIMEOUT}
@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+from accounts.models import Company
+from accounts.utils import resolve_membership
+
+
+class CompanyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        role, company = resolve_membership(request)
+        request.company_id = request.session.get('company_id') if request.user.is_authenticated else None
+        request.role = role
+        if company is not None:
+            request.company = company
+        else:
+            request.company = SimpleLazyObject(
+                lambda: Company.objects.filter(id=request.company_id).first() if request.company_id else None)
+        return self.get_response(request)
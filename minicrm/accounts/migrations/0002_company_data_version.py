@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='members_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -13,6 +13,11 @@ STATUS_CHOICES = (
     ('Rejected', 'Rejected'),
 )
 
+class CompanyQuerySet(models.QuerySet):
+    def for_company(self, company_id):
+        return self.filter(company_id=company_id)
+
+
 class Company(models.Model):
     name = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -20,6 +25,8 @@ class Company(models.Model):
     phone = models.BigIntegerField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_company')
     industry = models.CharField(max_length=80,null=True, blank=True)
+    data_version = models.PositiveIntegerField(default=0)
+    members_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
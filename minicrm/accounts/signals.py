@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import Company, CompanyUser
+from accounts.utils import invalidate_layout, invalidate_membership
+
+
+@receiver(post_save, sender=CompanyUser)
+@receiver(post_delete, sender=CompanyUser)
+def invalidate_cached_membership(sender, instance, **kwargs):
+    invalidate_membership(instance.company_id)
+
+
+@receiver(post_save, sender=Company)
+def invalidate_cached_layout(sender, instance, **kwargs):
+    invalidate_layout(instance.id)
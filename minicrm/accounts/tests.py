@@ -1,3 +1,61 @@
 from django.test import TestCase
+from django.db import connection
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from accounts.models import CompanyUser
+from core.testing import CompanyTestMixin
 
-# Create your tests here.
+
+class MembershipResolutionTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'password')
+        self.membership = CompanyUser.objects.create(user=self.staff, company=self.company, role='Staff')
+
+    def membership_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in context.captured_queries if 'accounts_companyuser' in q['sql']]
+
+    def test_no_membership_queries_when_cached(self):
+        self.login(self.staff)
+        response, queries = self.membership_queries('/core/dashboard/')
+        self.assertEqual(len(queries), 1)
+        response, queries = self.membership_queries('/core/dashboard/')
+        self.assertEqual(response.context['user_role'], 'Staff')
+        self.assertEqual(queries, [])
+
+    def test_role_change_invalidates_session(self):
+        self.login(self.staff)
+        self.client.get('/core/dashboard/')
+
+        admin_client = self.client_class()
+        self.login(self.user, admin_client)
+        admin_client.post('/companyuser/%d/' % self.membership.pk,
+                          {'role': 'Manager', 'salary': '0', 'status': 'Approved'})
+
+        response, queries = self.membership_queries('/core/dashboard/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context['user_role'], 'Manager')
+
+    def test_removed_member_loses_role(self):
+        self.login(self.staff)
+        self.client.get('/core/dashboard/')
+        self.membership.delete()
+
+        response, queries = self.membership_queries('/core/dashboard/')
+        self.assertIsNone(response.context['user_role'])
+
+    def test_change_from_another_worker_invalidates_session(self):
+        self.login(self.staff)
+        self.client.get('/core/dashboard/')
+        self.membership.role = 'Manager'
+        self.membership.save()
+        # nothing this worker cached is visible to the others
+        cache.clear()
+
+        response, queries = self.membership_queries('/core/dashboard/')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context['user_role'], 'Manager')
@@ -1,4 +1,13 @@
-from accounts.models import CompanyUser
+import time
+from django.core.cache import cache
+from django.db.models import F
+from accounts.models import Company, CompanyUser
+from core.metrics import record_cache
+
+# the resolved role is kept in the session along with the company's
+# members_version; any membership change in the company bumps that counter, so
+# every worker re-reads the role on the member's next request
+
 
 def get_user_company(request):
     company_id = request.session.get('company_id')
@@ -9,8 +18,54 @@ def get_user_company(request):
 def get_user_role(request, company_id):
     if not company_id:
         return None
+    if getattr(request, 'company_id', None) == company_id:
+        return request.role
     company_user = CompanyUser.objects.filter(user=request.user,company_id=company_id,status='Approved').first()
 
     if company_user:
         return company_user.role
     return None
+
+def bump_company_version(company_id):
+    Company.objects.filter(id=company_id).update(data_version=F('data_version') + 1)
+
+
+def invalidate_membership(company_id):
+    Company.objects.filter(id=company_id).update(members_version=F('members_version') + 1)
+
+
+def layout_key(company_id):
+    return 'layout:%s' % company_id
+
+
+def invalidate_layout(company_id):
+    cache.set(layout_key(company_id), time.time_ns(), None)
+
+
+def get_layout_version(company_id):
+    # the cached navigation fragments are keyed by this token, replacing it
+    # re-renders them for every member of the company
+    return cache.get_or_set(layout_key(company_id), time.time_ns, None)
+
+
+def resolve_membership(request):
+    company_id = get_user_company(request)
+    if not company_id or not request.user.is_authenticated:
+        return None, None
+
+    company = Company.objects.filter(id=company_id).first()
+    if company is None:
+        return None, None
+    cached = request.session.get('membership')
+    if cached and cached['company_id'] == company_id and cached.get('version') == company.members_version:
+        record_cache('membership', True)
+        return cached['role'], company
+    record_cache('membership', False)
+
+    company_user = CompanyUser.objects.filter(user=request.user, company_id=company_id, status='Approved').first()
+    role = company_user.role if company_user else None
+
+    request.session['role'] = role
+    request.session['membership'] = {
+        'company_id': company_id, 'role': role, 'version': company.members_version}
+    return role, company
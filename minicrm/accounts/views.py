@@ -6,6 +6,7 @@ from django.contrib.auth.models import User
 from accounts.models import Company, CompanyUser
 from accounts.forms import SignupForm, StartCompanyForm, JoinCompanyForm,AdminAddUserForm, CompanyUserForm, LoginForm
 from accounts.utils import get_user_company, get_user_role
+from core.pagination import paginate
 
 
 class SignupView(View):
@@ -260,9 +261,9 @@ class CompanyUserListView(View):
             messages.error(request, "Access denied.")
             return redirect('core:dashboard')
 
-        users = CompanyUser.objects.filter(
+        users = paginate(request, CompanyUser.objects.filter(
             company_id=company_id,
-            user__is_superuser=False).select_related('user')
+            user__is_superuser=False).select_related('user'))
         return render(request, 'user_list.html', {'users': users})
 
 
@@ -1,4 +1,8 @@
 from django.contrib import admin
-from core.models import Leave
+from core.models import Leave, SearchDocument, RequestProfile, StoredFile, Job
 
 admin.site.register(Leave)
+admin.site.register(SearchDocument)
+admin.site.register(RequestProfile)
+admin.site.register(StoredFile)
+admin.site.register(Job)
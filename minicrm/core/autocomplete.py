@@ -0,0 +1,171 @@
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.utils import timezone
+from accounts.models import Company
+from customers.models import Customer
+from inventory.models import Product
+from core.metrics import record_cache
+
+# per-process prefix indexes, least recently used companies are evicted first once
+# the total number of terms goes over MAX_TERMS. Writes made in this process update
+# the index once they commit; other workers' writes move the company's data_version,
+# and the index then reloads only the rows saved since it last synced.
+MAX_TERMS = 200000
+# rows saved this long before the last sync are read again, for clock skew between
+# workers and transactions that committed after it
+SYNC_MARGIN = timedelta(seconds=30)
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def product_terms(product_id, name, sku):
+    return 'product', product_id, name, [name] + name.split() + [sku]
+
+
+def customer_terms(customer_id, name, phone):
+    return 'customer', customer_id, "%s (%s)" % (name, phone), [name] + name.split() + [phone]
+
+
+class PrefixIndex:
+    def __init__(self, entries, version=None, synced_at=None):
+        self.labels = {}
+        self.keys = {}
+        terms = []
+        for kind, object_id, label, words in entries:
+            words = self.normalize(words)
+            self.labels[(kind, object_id)] = label
+            self.keys[(kind, object_id)] = words
+            terms.extend((word, kind, object_id) for word in words)
+        self.terms = sorted(terms)
+        self.version = version
+        self.synced_at = synced_at
+
+    @staticmethod
+    def normalize(words):
+        return sorted({word.strip().lower() for word in words if word and word.strip()})
+
+    def add(self, kind, object_id, label, words):
+        self.remove(kind, object_id)
+        words = self.normalize(words)
+        for word in words:
+            bisect.insort(self.terms, (word, kind, object_id))
+        self.labels[(kind, object_id)] = label
+        self.keys[(kind, object_id)] = words
+
+    def remove(self, kind, object_id):
+        for word in self.keys.pop((kind, object_id), []):
+            position = bisect.bisect_left(self.terms, (word, kind, object_id))
+            if position < len(self.terms) and self.terms[position] == (word, kind, object_id):
+                del self.terms[position]
+        self.labels.pop((kind, object_id), None)
+
+    def ids(self, kind):
+        return {object_id for term_kind, object_id in self.keys if term_kind == kind}
+
+    def lookup(self, prefix, kind=None, limit=10):
+        prefix = prefix.strip().lower()
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self.terms, (prefix,))
+        while position < len(self.terms) and len(results) < limit:
+            word, term_kind, object_id = self.terms[position]
+            if not word.startswith(prefix):
+                break
+            position += 1
+            if (kind and term_kind != kind) or (term_kind, object_id) in seen:
+                continue
+            seen.add((term_kind, object_id))
+            results.append({'type': term_kind, 'id': object_id, 'label': self.labels[(term_kind, object_id)]})
+        return results
+
+
+SOURCES = {
+    'product': (Product, ('id', 'name', 'sku'), product_terms),
+    'customer': (Customer, ('id', 'name', 'phone'), customer_terms),
+}
+
+
+def company_version(company_id):
+    return Company.objects.filter(id=company_id).values_list('data_version', flat=True).first()
+
+
+def build_index(company_id, version=None):
+    synced_at = timezone.now()
+    entries = []
+    for model, fields, terms in SOURCES.values():
+        entries += [terms(*row) for row in model.objects.for_company(company_id).values_list(*fields)]
+    return PrefixIndex(entries, version, synced_at)
+
+
+def refresh_index(index, company_id, version):
+    # deletions don't leave an updated_at behind, so they are found by comparing
+    # ids, which is only needed when the row counts no longer match
+    synced_at = timezone.now()
+    for kind, (model, fields, terms) in SOURCES.items():
+        rows = model.objects.for_company(company_id)
+        changed = [terms(*row) for row in
+                   rows.filter(updated_at__gte=index.synced_at - SYNC_MARGIN).values_list(*fields)]
+        with _lock:
+            for entry in changed:
+                index.add(*entry)
+            indexed = index.ids(kind)
+        if len(indexed) != rows.count():
+            removed = indexed - set(rows.values_list('id', flat=True))
+            with _lock:
+                for object_id in removed:
+                    index.remove(kind, object_id)
+    with _lock:
+        index.version, index.synced_at = version, synced_at
+
+
+def get_index(company_id):
+    version = company_version(company_id)
+    with _lock:
+        index = _indexes.get(company_id)
+        if index is not None:
+            _indexes.move_to_end(company_id)
+    if index is not None and index.version == version:
+        record_cache('autocomplete', True)
+        return index
+    record_cache('autocomplete', False)
+
+    if index is not None:
+        refresh_index(index, company_id, version)
+        return index
+    index = build_index(company_id, version)
+    with _lock:
+        _indexes[company_id] = index
+        _indexes.move_to_end(company_id)
+        while len(_indexes) > 1 and sum(len(i.terms) for i in _indexes.values()) > MAX_TERMS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def autocomplete(company_id, query, kind=None, limit=10):
+    index = get_index(company_id)
+    with _lock:
+        return index.lookup(query, kind, limit)
+
+
+def update_product(product, deleted=False):
+    update_entry(product.company_id, 'product', product.pk,
+                 None if deleted else product_terms(product.pk, product.name, product.sku))
+
+
+def update_customer(customer, deleted=False):
+    update_entry(customer.company_id, 'customer', customer.pk,
+                 None if deleted else customer_terms(customer.pk, customer.name, customer.phone))
+
+
+def update_entry(company_id, kind, object_id, entry):
+    with _lock:
+        index = _indexes.get(company_id)
+        if index is None:
+            return
+        if entry is None:
+            index.remove(kind, object_id)
+        else:
+            index.add(*entry)
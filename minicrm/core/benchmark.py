@@ -0,0 +1,360 @@
+import asyncio
+import multiprocessing
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.template.loader import render_to_string
+from django.test import AsyncClient, Client, RequestFactory
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from accounts.models import Company, CompanyUser
+from accounts.utils import invalidate_layout
+from core.models import Leave, RequestProfile
+from core.replicas import sync_replicas
+from customers.models import Customer, Lead
+from inventory.models import Category, Product
+from transaction.models import Order, Service
+
+BENCHMARK_APPS = ('accounts', 'core', 'customers', 'inventory', 'transaction')
+
+# GET on these logs out, deletes or moves stock, so running them would change
+# what the following routes measure
+SKIPPED_ROUTES = {'accounts:logout', 'inventory:stock_increase', 'inventory:stock_decrease'}
+SKIPPED_SUFFIXES = ('_delete',)
+
+ROUTE_OBJECTS = {
+    'accounts:approve_user': CompanyUser,
+    'accounts:user_manage': CompanyUser,
+    'core:leave_action': Leave,
+    'core:profile_download': RequestProfile,
+    'customers:lead_update': Lead,
+    'customers:customer_update': Customer,
+    'inventory:category_edit': Category,
+    'inventory:product_list': Category,
+    'inventory:product_detail': Product,
+    'inventory:product_edit': Product,
+    'inventory:stock_update': Product,
+    'transaction:order_edit': Order,
+    'transaction:order_detail': Order,
+    'transaction:service_edit': Service,
+    'transaction:service_detail': Service,
+}
+
+ROUTE_ARGUMENTS = {
+    'core:leave_action': {'action': 'approve'},
+    'core:profile_download': {'kind': 'report'},
+    'core:global_search': {'q': 'phone'},
+    'core:autocomplete': {'q': 'ph'},
+}
+
+
+def benchmark_company(company_id=None, username=None):
+    # the company to measure (the newest by default) and who to request as
+    # (its owner unless an approved member is named)
+    companies = Company.objects.select_related('owner')
+    company = companies.filter(id=company_id).first() if company_id else companies.last()
+    if company is None:
+        raise CommandError("No company to benchmark, run seed_data first.")
+    if not username:
+        return company, company.owner
+    membership = CompanyUser.objects.select_related('user').filter(
+        company=company, user__username=username, status='Approved').first()
+    if membership is None:
+        raise CommandError("%s is not an approved member of %s." % (username, company.name))
+    return company, membership.user
+
+
+def benchmark_routes():
+    resolver = get_resolver()
+    for app in BENCHMARK_APPS:
+        namespace = resolver.namespace_dict.get(app)
+        if namespace is None:
+            continue
+        for pattern in namespace[1].url_patterns:
+            if pattern.name:
+                yield '%s:%s' % (app, pattern.name), pattern.pattern.converters
+
+
+def route_url(name, converters, company_id):
+    kwargs = {}
+    if converters:
+        model = ROUTE_OBJECTS.get(name)
+        if model is None:
+            return None
+        object_id = model.objects.filter(company_id=company_id).order_by('-id').values_list('id', flat=True).first()
+        if object_id is None:
+            return None
+        for key in converters:
+            kwargs[key] = ROUTE_ARGUMENTS.get(name, {}).get(key, object_id)
+    url = reverse(name, kwargs=kwargs)
+    query = {key: value for key, value in ROUTE_ARGUMENTS.get(name, {}).items() if key not in converters}
+    if query:
+        url += '?' + '&'.join('%s=%s' % item for item in query.items())
+    return url
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(client, url, repeat):
+    # one traced request for peak memory; tracemalloc slows everything down,
+    # so latencies come from separate untraced requests
+    queries = []
+    tracemalloc.start()
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        response = client.get(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    for x in range(repeat):
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'url': url,
+        'status': response.status_code,
+        'queries': len(queries),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(company, user, repeat=20, host='localhost'):
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+    session = client.session
+    session['company_id'] = company.id
+    session.save()
+
+    results = {}
+    for name, converters in benchmark_routes():
+        if name in SKIPPED_ROUTES or name.endswith(SKIPPED_SUFFIXES):
+            results[name] = {'skipped': True}
+            continue
+        url = route_url(name, converters, company.id)
+        if url is None:
+            results[name] = {'skipped': True}
+            continue
+        results[name] = measure(client, url, repeat)
+
+    return {
+        'created_at': timezone.now().isoformat(),
+        'company': company.id,
+        'user': user.username,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_results(previous, current):
+    rows = []
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if result.get('skipped') or not before or before.get('skipped'):
+            continue
+        rows.append((name, before['p50_ms'], result['p50_ms'], before['queries'], result['queries']))
+    return rows
+
+
+def measure_layout(company, user, repeat=50, host='localhost', url='/core/dashboard/'):
+    # base.html on its own with every fragment missing (as before it was
+    # cached) and with the fragments cached, against a whole page request
+    request = RequestFactory(HTTP_HOST=host).get(url)
+    request.user = user
+    request.session = {'company_id': company.id}
+    request.company_id = company.id
+    request.role = CompanyUser.objects.filter(
+        user=user, company=company, status='Approved').values_list('role', flat=True).first()
+
+    def render(invalidate):
+        timings = []
+        for x in range(repeat):
+            if invalidate:
+                invalidate_layout(company.id)
+            started = time.perf_counter()
+            render_to_string('base.html', request=request)
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(percentile(timings, 0.5), 3)
+
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+    session = client.session
+    session['company_id'] = company.id
+    session.save()
+    client.get(url)
+    timings = []
+    for x in range(repeat):
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    uncached = render(True)
+    cached = render(False)
+    page = round(percentile(timings, 0.5), 3)
+    return {
+        'url': url,
+        'page_ms': page,
+        'layout_uncached_ms': uncached,
+        'layout_cached_ms': cached,
+        'uncached_share': round(uncached / (page - cached + uncached), 3),
+        'cached_share': round(cached / page, 3),
+    }
+
+
+CONCURRENCY_READS = (
+    'core:dashboard', 'transaction:order_list', 'inventory:all_products',
+    'customers:customer_list', 'customers:lead_list',
+)
+
+
+def concurrency_worker(company_id, user_id, duration, write_ratio, host, seed):
+    # forked workers must not share the parent's SQLite connection
+    connections.close_all()
+    rng = random.Random(seed)
+    client = Client(HTTP_HOST=host, raise_request_exception=False)
+    client.force_login(User.objects.get(id=user_id))
+    session = client.session
+    session['company_id'] = company_id
+    session.save()
+
+    reads = [reverse(name) for name in CONCURRENCY_READS]
+    products = list(Product.objects.for_company(company_id).values_list('id', flat=True)[:50])
+    timings = {'read': [], 'write': []}
+    errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if products and rng.random() < write_ratio:
+            kind = 'write'
+            url = reverse(rng.choice(['inventory:stock_increase', 'inventory:stock_decrease']),
+                          kwargs={'pk': rng.choice(products)})
+        else:
+            kind = 'read'
+            url = rng.choice(reads)
+        started = time.perf_counter()
+        response = client.get(url)
+        timings[kind].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 500:
+            errors += 1
+    connections.close_all()
+    return timings, errors
+
+
+def run_concurrency(company, user, workers=8, duration=10, write_ratio=0.2, host='localhost'):
+    # one process per worker, as under gunicorn; each loops over list pages
+    # and single stock movements until the duration is up
+    connections.close_all()
+    arguments = [(company.id, user.id, duration, write_ratio, host, seed) for seed in range(workers)]
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        results = pool.starmap(concurrency_worker, arguments)
+
+    summary = {'workers': workers, 'duration': duration, 'write_ratio': write_ratio,
+               'errors': sum(errors for timings, errors in results)}
+    total = 0
+    for kind in ('read', 'write'):
+        timings = [value for worker_timings, errors in results for value in worker_timings[kind]]
+        total += len(timings)
+        summary[kind] = {
+            'requests': len(timings),
+            'p50_ms': round(percentile(timings, 0.5), 2) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+            'p99_ms': round(percentile(timings, 0.99), 2) if timings else None,
+        }
+    summary['throughput'] = round(total / duration, 1)
+    return summary
+
+
+def run_replica_scaling(company, user, counts, workers=8, duration=10, host='localhost'):
+    # read-only traffic against the primary plus the first n replicas
+    configured = list(settings.DATABASE_REPLICAS)
+    sync_replicas(configured[:max(counts)])
+    results = []
+    try:
+        for count in counts:
+            settings.DATABASE_REPLICAS = configured[:count]
+            result = run_concurrency(company, user, workers, duration, 0, host)
+            results.append((count, result['throughput'], result['read']['p50_ms'], result['read']['p99_ms']))
+    finally:
+        settings.DATABASE_REPLICAS = configured
+    return results
+
+
+PROTOCOL_URLS = (
+    ('core:dashboard', ''),
+    ('core:global_search', '?q=phone'),
+    ('transaction:service_add', ''),
+)
+
+
+def protocol_summary(timings, elapsed):
+    return {
+        'requests': len(timings),
+        'throughput': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+    }
+
+
+def run_protocol_benchmark(company, user, concurrency=8, requests=200, host='localhost'):
+    # the async views driven through Django's WSGI handler from a thread per
+    # client, and through its ASGI handler from one event loop
+    login = Client(HTTP_HOST=host)
+    login.force_login(user)
+    session = login.session
+    session['company_id'] = company.id
+    session.save()
+    urls = [reverse(name) + query for name, query in PROTOCOL_URLS]
+    per_client = max(requests // concurrency, 1)
+
+    def wsgi_client(number):
+        client = Client(HTTP_HOST=host)
+        client.cookies = login.cookies
+        timings = []
+        for x in range(per_client):
+            started = time.perf_counter()
+            client.get(urls[(number + x) % len(urls)])
+            timings.append((time.perf_counter() - started) * 1000)
+        connections.close_all()
+        return timings
+
+    async def asgi_client(client, number):
+        timings = []
+        for x in range(per_client):
+            started = time.perf_counter()
+            await client.get(urls[(number + x) % len(urls)])
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    async def asgi_run():
+        client = AsyncClient(HTTP_HOST=host)
+        client.cookies = login.cookies
+        return await asyncio.gather(*(asgi_client(client, number) for number in range(concurrency)))
+
+    # one untimed pass so both start with warm caches and connections
+    for url in urls:
+        login.get(url)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        wsgi = [value for timings in pool.map(wsgi_client, range(concurrency)) for value in timings]
+    wsgi_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    asgi = [value for timings in asyncio.run(asgi_run()) for value in timings]
+    asgi_elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'wsgi': protocol_summary(wsgi, wsgi_elapsed),
+        'asgi': protocol_summary(asgi, asgi_elapsed),
+    }
@@ -0,0 +1,147 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from django.db import IntegrityError, close_old_connections, connections
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.models import Job
+from core.writes import write_atomic
+
+logger = logging.getLogger(__name__)
+
+# a job still Running after this long lost its worker and is handed out again
+JOB_TIMEOUT = timedelta(minutes=10)
+# seconds before the first retry, doubled for each one after it
+RETRY_DELAY = 30
+POLL_INTERVAL = 1.0
+
+
+def job(max_attempts=3, priority=0):
+    # marks a function as runnable by the workers; it is stored by its import
+    # path, so it must be a module-level function taking JSON arguments. Jobs
+    # queued for a company are also passed its company_id
+    def register(function):
+        function.job_name = '%s.%s' % (function.__module__, function.__name__)
+        function.max_attempts = max_attempts
+        function.priority = priority
+        return function
+    return register
+
+
+def enqueue(function, company_id=None, dedupe_key=None, priority=None, delay=0, **arguments):
+    # runs in the caller's transaction, so a job is only seen once the change
+    # that asked for it is committed. With a dedupe key, a job with the same
+    # key still waiting to run is returned instead of queueing another
+    values = dict(
+        name=function.job_name, company_id=company_id, arguments=arguments, dedupe_key=dedupe_key,
+        priority=function.priority if priority is None else priority, max_attempts=function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay))
+    if dedupe_key is None:
+        return Job.objects.create(**values)
+    queued = Job.objects.filter(dedupe_key=dedupe_key, status='Queued').first()
+    if queued is not None:
+        return queued
+    try:
+        with write_atomic():
+            return Job.objects.create(**values)
+    except IntegrityError:
+        return Job.objects.filter(dedupe_key=dedupe_key, status='Queued').first()
+
+
+def worker_name(index=0):
+    return '%s:%d:%d' % (socket.gethostname(), os.getpid(), index)
+
+
+def requeue_stale():
+    return Job.objects.filter(status='Running', locked_at__lt=timezone.now() - JOB_TIMEOUT).update(
+        status='Queued', locked_by='', locked_at=None)
+
+
+def claim_job(worker):
+    # highest priority first; among equals, the company with the fewest jobs
+    # running goes first, so one company's backlog doesn't hold up the rest
+    now = timezone.now()
+    running = (Job.objects.filter(status='Running', company_id=OuterRef('company_id'))
+               .order_by().values('company_id').annotate(count=Count('id')).values('count'))
+    with write_atomic():
+        job = (Job.objects.select_for_update(skip_locked=True)
+               .filter(status='Queued', run_at__lte=now)
+               .annotate(running=Coalesce(Subquery(running, output_field=IntegerField()), Value(0)))
+               .order_by('-priority', 'running', 'run_at', 'id').first())
+        if job is None:
+            return None
+        Job.objects.filter(id=job.id).update(
+            status='Running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1)
+    job.status, job.locked_by, job.locked_at = 'Running', worker, now
+    job.attempts += 1
+    return job
+
+
+def run_job(job):
+    try:
+        arguments = dict(job.arguments)
+        if job.company_id:
+            arguments['company_id'] = job.company_id
+        import_string(job.name)(**arguments)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.id, job.name)
+        fail_job(job, traceback.format_exc())
+        return False
+    Job.objects.filter(id=job.id).update(status='Done', finished_at=timezone.now(), last_error='')
+    return True
+
+
+def fail_job(job, error):
+    jobs = Job.objects.filter(id=job.id)
+    if job.attempts >= job.max_attempts:
+        jobs.update(status='Failed', last_error=error, finished_at=timezone.now())
+        return
+    retry_at = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    try:
+        with write_atomic():
+            jobs.update(status='Queued', last_error=error, locked_by='', locked_at=None, run_at=retry_at)
+    except IntegrityError:
+        # the same work was queued again meanwhile and will run on its own
+        jobs.update(status='Failed', last_error=error, finished_at=timezone.now())
+
+
+def run_pending_jobs(worker=None, limit=None):
+    # runs due jobs in this thread until there are none left
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def work(worker, stop, poll_interval=POLL_INTERVAL):
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim_job(worker)
+            if job is None:
+                requeue_stale()
+                stop.wait(poll_interval)
+                continue
+            run_job(job)
+    finally:
+        connections.close_all()
+
+
+def start_workers(count, poll_interval=POLL_INTERVAL):
+    stop = threading.Event()
+    threads = [threading.Thread(target=work, args=(worker_name(index), stop, poll_interval),
+                                name='job-worker-%d' % index, daemon=True)
+               for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return stop, threads
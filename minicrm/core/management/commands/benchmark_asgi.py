@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.benchmark import benchmark_company, run_protocol_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare latency of the async dashboard, search and service form under WSGI and ASGI at concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: the newest company)")
+        parser.add_argument('--concurrency', type=int, default=8, help="Simultaneous clients")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per protocol")
+        parser.add_argument('--host', default='localhost', help="Host header to send")
+
+    def handle(self, *args, **options):
+        company, user = benchmark_company(options['company'])
+
+        result = run_protocol_benchmark(company, user, options['concurrency'], options['requests'],
+                                        options['host'])
+        for protocol in ('wsgi', 'asgi'):
+            row = result[protocol]
+            self.stdout.write("%s  %7.1f req/s  p50 %8.2fms  p95 %8.2fms  p99 %8.2fms" % (
+                protocol, row['throughput'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
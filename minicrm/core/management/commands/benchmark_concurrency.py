@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.benchmark import benchmark_company, run_concurrency
+
+
+class Command(BaseCommand):
+    help = "Run mixed read/write traffic from several processes and report throughput and tail latency (writes stock movements)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: the newest company)")
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent worker processes")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Share of requests that write")
+        parser.add_argument('--host', default='localhost', help="Host header to send")
+        parser.add_argument('--baseline', action='store_true',
+                            help="Use SQLite's defaults (rollback journal, no write queue) to compare against")
+
+    def handle(self, *args, **options):
+        company, user = benchmark_company(options['company'])
+
+        if options['baseline']:
+            settings.SQLITE_WRITE_QUEUE = False
+            connection = connections['default']
+            connection.close()
+            connection.settings_dict['OPTIONS'] = {}
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+
+        try:
+            result = run_concurrency(company, user, options['workers'], options['duration'],
+                                     options['write_ratio'], options['host'])
+        finally:
+            if options['baseline']:
+                # the journal mode is kept in the file; put back what migrate set
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=WAL')
+        for kind in ('read', 'write'):
+            row = result[kind]
+            if not row['requests']:
+                continue
+            self.stdout.write("%-5s %6d requests  p50 %8.2fms  p95 %8.2fms  p99 %8.2fms" % (
+                kind, row['requests'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
+        self.stdout.write(self.style.SUCCESS("%.1f requests/s with %d workers, %d errors." % (
+            result['throughput'], result['workers'], result['errors'])))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.benchmark import benchmark_company, measure_layout
+
+
+class Command(BaseCommand):
+    help = "Time rendering base.html with and without its cached fragments against a whole page request"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: the newest company)")
+        parser.add_argument('--repeat', type=int, default=50, help="Renders and requests to time")
+        parser.add_argument('--host', default='localhost', help="Host header to send")
+        parser.add_argument('--url', default='/core/dashboard/', help="Page to compare against")
+
+    def handle(self, *args, **options):
+        company, user = benchmark_company(options['company'])
+
+        result = measure_layout(company, user, options['repeat'], options['host'], options['url'])
+        self.stdout.write("%s p50 %.2fms" % (result['url'], result['page_ms']))
+        self.stdout.write("base.html uncached %.2fms (%.0f%% of the request)" % (
+            result['layout_uncached_ms'], result['uncached_share'] * 100))
+        self.stdout.write(self.style.SUCCESS("base.html cached   %.2fms (%.0f%% of the request)" % (
+            result['layout_cached_ms'], result['cached_share'] * 100)))
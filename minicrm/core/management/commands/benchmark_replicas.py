@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmark import benchmark_company, run_replica_scaling
+
+
+class Command(BaseCommand):
+    help = "Measure read throughput of the replica-routed views with 0..N of DATABASE_REPLICAS in use"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: the newest company)")
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent worker processes")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per replica count")
+        parser.add_argument('--host', default='localhost', help="Host header to send")
+
+    def handle(self, *args, **options):
+        company, user = benchmark_company(options['company'])
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured, set DATABASE_REPLICAS.")
+
+        counts = range(len(settings.DATABASE_REPLICAS) + 1)
+        for count, throughput, p50, p99 in run_replica_scaling(
+                company, user, counts, options['workers'], options['duration'], options['host']):
+            self.stdout.write("%d replicas  %7.1f reads/s  p50 %8.2fms  p99 %8.2fms" % (count, throughput, p50, p99))
@@ -0,0 +1,39 @@
+import json
+from django.core.management.base import BaseCommand
+from core.benchmark import benchmark_company, run_benchmark, compare_results
+
+
+class Command(BaseCommand):
+    help = "Time every named route for one company and write p50/p95 latency, query count and peak memory as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Company id (default: the newest company)")
+        parser.add_argument('--user', help="Username to request as (default: the company owner)")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed requests per route")
+        parser.add_argument('--host', default='localhost', help="Host header to send")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the results")
+        parser.add_argument('--compare', help="Earlier results file to compare against")
+
+    def handle(self, *args, **options):
+        company, user = benchmark_company(options['company'], options['user'])
+
+        results = run_benchmark(company, user, options['repeat'], options['host'])
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+
+        for name, result in results['results'].items():
+            if result.get('skipped'):
+                self.stdout.write("%-36s skipped" % name)
+            else:
+                self.stdout.write("%-36s %3d  p50 %8.2fms  p95 %8.2fms  %4d queries  %8.1fKB" % (
+                    name, result['status'], result['p50_ms'], result['p95_ms'], result['queries'], result['peak_kb']))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+            self.stdout.write("")
+            for name, p50_before, p50_after, queries_before, queries_after in compare_results(previous, results):
+                self.stdout.write("%-36s p50 %8.2f -> %8.2fms  queries %4d -> %4d" % (
+                    name, p50_before, p50_after, queries_before, queries_after))
+
+        self.stdout.write(self.style.SUCCESS("Wrote %s." % options['output']))
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from core.staticfiles import brotli, directory_size, first_load
+
+
+class Command(BaseCommand):
+    help = "Collect the static files templates use, fingerprinted and precompressed, and report first-load bytes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--template', default='base.html', help="Page whose assets make up the first load")
+
+    def handle(self, *args, **options):
+        call_command('collectstatic', interactive=False, clear=True, verbosity=0)
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("brotli is not installed, only gzip variants were written."))
+
+        source = sum(directory_size(directory) for directory in settings.STATICFILES_DIRS)
+        collected = directory_size(settings.STATIC_ROOT, skip=('.gz', '.br'))
+        self.stdout.write("Static files: %.1fMB in the source tree, %.1fMB collected (each file plus its fingerprinted copy)." % (
+            source / 1024 / 1024, collected / 1024 / 1024))
+
+        before = after = 0
+        for name, original, served in first_load(options['template']):
+            before += original
+            after += served or original
+            self.stdout.write("%-56s %9d -> %9d" % (name, original, served or original))
+        self.stdout.write(self.style.SUCCESS("First load of %s: %.1fKB -> %.1fKB." % (
+            options['template'], before / 1024, after / 1024)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core.media import dedupe_media
+
+
+class Command(BaseCommand):
+    help = "Move product and category images into content-addressed storage and recount their references"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge', action='store_true',
+                            help="Also delete files in the old product/ and category/ folders that nothing uses")
+
+    def handle(self, *args, **options):
+        removed, stored, released = dedupe_media(options['purge'])
+        self.stdout.write(self.style.SUCCESS(
+            "Removed %d old image files, %d stored files in use, %d unreferenced stored files deleted." % (
+                removed, stored, released)))
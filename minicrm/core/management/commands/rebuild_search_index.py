@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from core.models import SearchDocument
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for products, categories, customers and leads"
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Indexed %d documents." % SearchDocument.objects.count()))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.jobs import POLL_INTERVAL, requeue_stale, run_pending_jobs, start_workers
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--poll', type=float, default=POLL_INTERVAL,
+                            help="Seconds an idle worker waits before looking for jobs again")
+        parser.add_argument('--once', action='store_true',
+                            help="Run the jobs that are due in this process and exit")
+
+    def handle(self, *args, **options):
+        requeue_stale()
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write(self.style.SUCCESS("Ran %d job(s)." % count))
+            return
+
+        stop, threads = start_workers(options['workers'], options['poll'])
+        self.stdout.write("Running jobs with %d worker(s), Ctrl+C to stop." % options['workers'])
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
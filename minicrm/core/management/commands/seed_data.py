@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from core.seed import seed, DEFAULT_COUNTS
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic companies with users, customers, leads, products, orders, services and leaves"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=1, help="Number of companies to create")
+        parser.add_argument('--prefix', default='Seed', help="Company name prefix")
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable data")
+        parser.add_argument('--password', default='password', help="Password for every seeded user")
+        for name, default in DEFAULT_COUNTS.items():
+            parser.add_argument('--' + name, type=int, default=default,
+                                help="%s per company (default %d)" % (name.capitalize(), default))
+
+    def handle(self, *args, **options):
+        counts = {name: options[name] for name in DEFAULT_COUNTS}
+        companies = seed(options['companies'], counts, options['prefix'], options['seed'], options['password'])
+        for company in companies:
+            self.stdout.write("%s (id %d), log in as %s" % (company.name, company.id, company.owner.username))
+        self.stdout.write(self.style.SUCCESS("Seeded %d companies." % len(companies)))
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from core.replicas import sync_replicas
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to each SQLite replica in DATABASE_REPLICAS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="Keep copying every this many seconds (keep it under REPLICA_PIN_SECONDS)")
+
+    def handle(self, *args, **options):
+        while True:
+            synced = sync_replicas()
+            self.stdout.write(self.style.SUCCESS("Synced %s." % (', '.join(synced) or "no replicas")))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
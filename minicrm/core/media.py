@@ -0,0 +1,85 @@
+from collections import Counter
+from functools import partial
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.db.transaction import on_commit
+from core.models import StoredFile
+from core.storage import CONTENT_DIR
+from core.writes import write_atomic
+from inventory.images import delete_variants
+from inventory.models import Category, Product
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(CONTENT_DIR + '/')
+
+
+def add_reference(name):
+    if not is_content_addressed(name):
+        return
+    with write_atomic():
+        StoredFile.objects.get_or_create(name=name)
+        StoredFile.objects.filter(name=name).update(references=F('references') + 1)
+
+
+def release_reference(name):
+    # the row is kept at zero references until the file is gone, so its lock
+    # orders the delete with uploads of the same bytes
+    if not is_content_addressed(name):
+        return
+    StoredFile.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+    if StoredFile.objects.filter(name=name, references=0).exists():
+        # a rolled back release must keep the file
+        on_commit(partial(delete_unreferenced, name))
+
+
+def delete_unreferenced(name):
+    # the same bytes may have been uploaded again since the release committed
+    with write_atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name, references=0).first()
+        if stored is None:
+            return
+        default_storage.delete(name)
+        delete_variants(default_storage, name)
+        stored.delete()
+
+
+LEGACY_DIRS = ('product', 'category')
+
+
+def dedupe_media(purge=False):
+    # moves images stored before content addressing under their hash, then
+    # recounts every reference; files left with none are deleted. purge also
+    # removes files in the old upload folders that nothing points at
+    obsolete = set()
+    for model in (Category, Product):
+        names = model.objects.exclude(image='').values_list('image', flat=True).distinct()
+        for name in [name for name in names if not is_content_addressed(name)]:
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name) as f:
+                stored = default_storage.save(name, f)
+            model.objects.filter(image=name).update(image=stored)
+            obsolete.add(name)
+
+    counts = Counter()
+    for model in (Category, Product):
+        counts.update(name for name in model.objects.values_list('image', flat=True) if is_content_addressed(name))
+    for name, references in counts.items():
+        StoredFile.objects.update_or_create(name=name, defaults={'references': references})
+
+    released = 0
+    for name in StoredFile.objects.exclude(name__in=list(counts)).values_list('name', flat=True):
+        StoredFile.objects.filter(name=name).update(references=0)
+        release_reference(name)
+        released += 1
+
+    if purge:
+        for directory in LEGACY_DIRS:
+            if default_storage.exists(directory):
+                obsolete.update('%s/%s' % (directory, name) for name in default_storage.listdir(directory)[1])
+
+    for name in obsolete:
+        default_storage.delete(name)
+        delete_variants(default_storage, name)
+    return len(obsolete), len(counts), released
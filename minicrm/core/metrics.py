@@ -0,0 +1,184 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0
+
+HELP = {
+    'minicrm_requests_total': ('counter', "Requests by view, method and status class"),
+    'minicrm_request_duration_seconds': ('histogram', "Request latency by view"),
+    'minicrm_db_time_seconds_total': ('counter', "Time spent in SQL by view"),
+    'minicrm_db_queries_total': ('counter', "SQL statements by view"),
+    'minicrm_cache_requests_total': ('counter', "Application cache lookups by cache and result"),
+}
+
+
+def metrics_dir():
+    return settings.METRICS_DIR or os.path.join(tempfile.gettempdir(), 'minicrm-metrics')
+
+
+class Registry:
+    # each worker keeps its own counters and writes them to <pid>.json in the
+    # metrics directory; the endpoint sums every worker's file
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for position, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[position] += 1
+                    break
+            else:
+                histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += value
+
+    def observe_request(self, view, method, status, duration, db_time, queries):
+        labels = {'view': view}
+        self.inc('minicrm_requests_total', {'view': view, 'method': method, 'status': '%dxx' % (status // 100)})
+        self.observe('minicrm_request_duration_seconds', labels, duration)
+        self.inc('minicrm_db_time_seconds_total', labels, db_time)
+        self.inc('minicrm_db_queries_total', labels, queries)
+        self.maybe_flush()
+
+    def absorb(self, data):
+        with self.lock:
+            for name, labels, value in data['counters']:
+                self.counters[(name, tuple(map(tuple, labels)))] += value
+            for name, labels, values in data['histograms']:
+                histogram = self.histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(values))
+                for position, value in enumerate(values):
+                    histogram[position] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.flushed_at = time.monotonic()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '%d.json' % os.getpid())
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f.name, path)
+
+
+registry = Registry()
+
+
+def record_cache(cache, hit):
+    registry.inc('minicrm_cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def retire_dead_workers():
+    # a worker that exited leaves its <pid>.json behind; this worker takes over
+    # its counts, so totals never go down and the files don't pile up. Needs
+    # METRICS_DIR to be local to the host, as pids are
+    if os.name != 'posix':
+        return
+    directory = metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        pid = name[:-len('.json')]
+        if not name.endswith('.json') or not pid.isdigit() or int(pid) == os.getpid() or pid_running(int(pid)):
+            continue
+        claimed = os.path.join(directory, '%s.%d.claimed' % (pid, os.getpid()))
+        try:
+            os.rename(os.path.join(directory, name), claimed)
+        except OSError:
+            continue
+        try:
+            with open(claimed) as f:
+                registry.absorb(json.load(f))
+        except (OSError, ValueError, KeyError):
+            pass
+        os.remove(claimed)
+
+
+def collect():
+    retire_dead_workers()
+    registry.flush()
+    counters = defaultdict(float)
+    histograms = {}
+    directory = metrics_dir()
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric, labels, value in data['counters']:
+            counters[(metric, tuple(map(tuple, labels)))] += value
+        for metric, labels, values in data['histograms']:
+            key = (metric, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for position, value in enumerate(values):
+                total[position] += value
+    return counters, histograms
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                             for key, value in pairs)
+
+
+def render_metrics():
+    counters, histograms = collect()
+    lines = []
+    for metric, (kind, description) in HELP.items():
+        lines.append('# HELP %s %s' % (metric, description))
+        lines.append('# TYPE %s %s' % (metric, kind))
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append('%s%s %s' % (metric, format_labels(labels), repr(float(value))))
+            continue
+        for (name, labels), values in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), values[:-1]):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (metric, format_labels(labels, [('le', bound)]), cumulative))
+            lines.append('%s_sum%s %s' % (metric, format_labels(labels), repr(float(values[-1]))))
+            lines.append('%s_count%s %d' % (metric, format_labels(labels), cumulative))
+    return '\n'.join(lines) + '\n'
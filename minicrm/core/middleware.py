@@ -0,0 +1,100 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from core.metrics import registry
+
+logger = logging.getLogger('minicrm.slow_requests')
+
+current_metrics = ContextVar('request_metrics', default=None)
+
+IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def sql_shape(sql):
+    return LITERAL.sub('?', IN_LIST.sub('(...)', sql))
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.shapes[sql_shape(sql)] += 1
+
+    @contextmanager
+    def installed(self):
+        # connections are per thread, so threads running queries for the
+        # request (core.queries) install it on theirs too
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield
+
+    def repeated_shapes(self, limit=5):
+        return [{'sql': sql, 'count': count} for sql, count in self.shapes.most_common(limit) if count > 1]
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with metrics.installed():
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        total = (time.perf_counter() - started) * 1000
+
+        db = metrics.db_time * 1000
+        template = metrics.template_time * 1000
+        response['Server-Timing'] = ', '.join([
+            'db;dur=%.1f;desc="%d queries"' % (db, metrics.queries),
+            'tpl;dur=%.1f' % template,
+            # queries gathered on other threads overlap, so db can exceed the wall time
+            'view;dur=%.1f' % max(total - db - template, 0),
+            'total;dur=%.1f' % total,
+        ])
+
+        match = request.resolver_match
+        registry.observe_request(
+            match.view_name if match else 'unmatched', request.method, response.status_code,
+            total / 1000, metrics.db_time, metrics.queries)
+
+        if (metrics.queries > settings.SLOW_REQUEST_QUERY_BUDGET
+                or total > settings.SLOW_REQUEST_TIME_BUDGET_MS):
+            logger.warning(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'total_ms': round(total, 1),
+                'db_ms': round(db, 1),
+                'template_ms': round(template, 1),
+                'queries': metrics.queries,
+                'repeated_sql': metrics.repeated_shapes(),
+            }))
+        return response
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5("
+    "title, body, content='core_searchdocument', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN "
+    "INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN "
+    "INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER core_searchdocument_au AFTER UPDATE ON core_searchdocument BEGIN "
+    "INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO core_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_au",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ai",
+    "DROP TABLE IF EXISTS core_searchdocument_fts",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in FTS_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in FTS_DROP_SQL:
+            schema_editor.execute(sql)
+
+
+def backfill_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    sources = [
+        ('product', apps.get_model('inventory', 'Product').objects.select_related('category'),
+         lambda p: (p.name, ' '.join([p.sku, p.category.name, p.specifications]))),
+        ('category', apps.get_model('inventory', 'Category').objects.all(),
+         lambda c: (c.name, '')),
+        ('customer', apps.get_model('customers', 'Customer').objects.all(),
+         lambda c: (c.name, ' '.join([c.email, c.phone, c.address]))),
+        ('lead', apps.get_model('customers', 'Lead').objects.all(),
+         lambda l: (l.name, ' '.join(filter(None, [l.email, l.phone, l.address])))),
+    ]
+    for kind, objects, builder in sources:
+        documents = []
+        for obj in objects.iterator():
+            title, body = builder(obj)
+            documents.append(SearchDocument(company_id=obj.company_id, kind=kind, object_id=obj.pk,
+                                            title=title, body=body))
+        SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('core', '0001_initial'),
+        ('customers', '0003_alter_lead_address'),
+        ('inventory', '0002_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('category', 'Category'), ('customer', 'Customer'), ('lead', 'Lead')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.company')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
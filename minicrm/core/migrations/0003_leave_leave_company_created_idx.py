@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('core', '0002_searchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leave',
+            index=models.Index(fields=['company', '-created_at', '-id'], name='leave_company_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.conf import settings
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('core', '0003_leave_leave_company_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=255)),
+                ('status', models.PositiveIntegerField()),
+                ('duration', models.FloatField()),
+                ('stats', models.FileField(storage=core.models.private_storage, upload_to='profiles/')),
+                ('report', models.FileField(storage=core.models.private_storage, upload_to='profiles/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.company')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
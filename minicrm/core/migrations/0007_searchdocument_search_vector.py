@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+# PostgreSQL keeps a weighted tsvector of each document in a generated column
+# with a GIN index; SQLite uses the FTS5 table from 0002 instead
+VECTOR_SQL = [
+    "ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX core_searchdocument_vector_idx ON core_searchdocument USING gin (search_vector)",
+]
+
+VECTOR_DROP_SQL = [
+    "DROP INDEX IF EXISTS core_searchdocument_vector_idx",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in VECTOR_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in VECTOR_DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_vector_index, drop_vector_index),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+# WAL is a property of the database file, so it is set once here rather than
+# on every connection; it can't be changed inside a transaction
+def enable_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=WAL')
+
+
+def disable_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_searchdocument_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, disable_wal),
+    ]
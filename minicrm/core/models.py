@@ -1,6 +1,8 @@
+from django.core.files.storage import storages
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
-from accounts.models import Company, CompanyUser
+from accounts.models import Company, CompanyQuerySet
 
 LEAVE_STATUS = (
     ('Pending', 'Pending'),
@@ -18,5 +20,107 @@ class Leave(models.Model):
     status = models.CharField(max_length=20, choices=LEAVE_STATUS, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', '-created_at', '-id'], name='leave_company_created_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
+
+
+SEARCH_KINDS = (
+    ('product', 'Product'),
+    ('category', 'Category'),
+    ('customer', 'Customer'),
+    ('lead', 'Lead'),
+)
+
+class SearchDocument(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=SEARCH_KINDS)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return self.title
+
+
+def private_storage():
+    return storages['private']
+
+
+class RequestProfile(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    status = models.PositiveIntegerField()
+    duration = models.FloatField()
+    stats = models.FileField(upload_to='profiles/', storage=private_storage)
+    report = models.FileField(upload_to='profiles/', storage=private_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CompanyQuerySet.as_manager()
+
+    def __str__(self):
+        return "%s %s" % (self.method, self.path)
+
+
+class StoredFile(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+JOB_STATUS = (
+    ('Queued', 'Queued'),
+    ('Running', 'Running'),
+    ('Done', 'Done'),
+    ('Failed', 'Failed'),
+)
+
+class Job(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, blank=True)
+    name = models.CharField(max_length=200)
+    arguments = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='Queued')
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['company', '-id'], name='job_company_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=models.Q(status='Queued'),
+                                    name='job_queued_dedupe_key'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def error_summary(self):
+        lines = self.last_error.strip().splitlines()
+        return lines[-1] if lines else ''
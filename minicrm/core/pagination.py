@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 30
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, date) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, fields):
+    # cursors come back from the client, so anything that doesn't convert to
+    # the ordering fields' types is treated as no cursor at all
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    try:
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError):
+        return None
+    if any(value is None for value in values):
+        return None
+    return values
+
+
+def keyset_filter(ordering, values, reverse=False):
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        step = Q(**{name + ('__lt' if descending else '__gt'): values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+class CursorPage:
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, field.lstrip('-')) for field in self.ordering])
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return self.cursor_for(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return self.cursor_for(self.object_list[0])
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+# keyset pagination: the last ordering field must be unique (normally -id)
+# so cursors stay stable while rows are added or removed
+def paginate(request, queryset, ordering=('-id',), per_page=PAGE_SIZE):
+    ordering = list(ordering)
+    fields = [queryset.model._meta.get_field(field.lstrip('-')) for field in ordering]
+    after = decode_cursor(request.GET.get('after', ''), fields)
+    before = decode_cursor(request.GET.get('before', ''), fields)
+
+    if before is not None:
+        reversed_ordering = [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+        rows = list(queryset.filter(keyset_filter(ordering, before, reverse=True))
+                    .order_by(*reversed_ordering)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(rows, ordering, has_next=True, has_previous=has_previous)
+
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(ordering, after))
+
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    has_next = len(rows) > per_page
+    return CursorPage(rows[:per_page], ordering, has_next=has_next, has_previous=after is not None)
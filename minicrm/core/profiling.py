@@ -0,0 +1,86 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from core.models import RequestProfile
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+PROFILE_SALT = 'core.profiling'
+
+# cProfile and tracemalloc are process wide, so only one request is profiled at a time
+_profiling = threading.Lock()
+
+
+def make_profile_token(user):
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign(str(user.pk))
+
+
+def check_profile_token(token, user):
+    try:
+        value = signing.TimestampSigner(salt=PROFILE_SALT).unsign(token, max_age=PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == str(user.pk)
+
+
+def save_profile(request, response, profiler, snapshot, duration):
+    profiler.create_stats()
+    report = io.StringIO()
+    report.write("%s %s -> %d in %.1fms\n\n" % (request.method, request.get_full_path(), response.status_code, duration))
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(50)
+    report.write("\nTop allocations\n\n")
+    for stat in snapshot.statistics('lineno')[:30]:
+        report.write("%s\n" % stat)
+
+    name = timezone.now().strftime('%Y%m%d-%H%M%S-%f')
+    profile = RequestProfile(
+        company_id=request.company_id, user=request.user, method=request.method,
+        path=request.path[:255], status=response.status_code, duration=duration)
+    profile.stats.save(name + '.prof', ContentFile(marshal.dumps(profiler.stats)), save=False)
+    profile.report.save(name + '.txt', ContentFile(report.getvalue().encode()), save=False)
+    profile.save()
+    return profile
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+        if not token:
+            return self.get_response(request)
+        if request.role != 'Admin' or not check_profile_token(token, request.user):
+            return self.get_response(request)
+        if not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                duration = (time.perf_counter() - started) * 1000
+                snapshot = tracemalloc.take_snapshot()
+                if not tracing:
+                    tracemalloc.stop()
+            profile = save_profile(request, response, profiler, snapshot, duration)
+        finally:
+            _profiling.release()
+
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
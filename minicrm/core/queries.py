@@ -0,0 +1,45 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from core.middleware import current_metrics
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def query_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.ASYNC_QUERY_WORKERS, thread_name_prefix='query')
+        return _executor
+
+
+def run_query(function):
+    # pool threads keep their own connections between requests
+    close_old_connections()
+    metrics = current_metrics.get()
+    if metrics is None:
+        return function()
+    with metrics.installed():
+        return function()
+
+
+def in_transaction():
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+async def gather_queries(*functions):
+    # runs independent queries at the same time, each on a pooled thread with
+    # its own connection. Inside a transaction (tests, a view already
+    # writing) other connections can't see its rows, so they run in order
+    if not settings.ASYNC_QUERY_WORKERS or await sync_to_async(in_transaction)():
+        return [await sync_to_async(function)() for function in functions]
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(query_executor(), contextvars.copy_context().run, run_query, function)
+        for function in functions))
@@ -0,0 +1,88 @@
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_SESSION_KEY = 'primary_until'
+
+
+class ReadState:
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+current_reads = ContextVar('replica_reads', default=None)
+
+
+class ReplicaRouter:
+    # reads go to a replica only inside views marked replica_reads, chosen
+    # per request by ReplicaMiddleware; everything else uses the primary
+    def db_for_read(self, model, **hints):
+        state = current_reads.get()
+        if state is None or state.wrote:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = current_reads.get()
+        if state is not None and model._meta.app_label != 'sessions':
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    # a session that wrote reads from the primary for REPLICA_PIN_SECONDS,
+    # so it sees its own changes before the replicas catch up
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = ReadState()
+        token = current_reads.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_reads.reset(token)
+        if state.wrote and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        view_class = getattr(view_func, 'view_class', None)
+        if (replicas and request.method in ('GET', 'HEAD') and getattr(view_class, 'replica_reads', False)
+                and request.session.get(PIN_SESSION_KEY, 0) < time.time()):
+            current_reads.get().alias = random.choice(replicas)
+
+
+def sync_replicas(aliases=None):
+    # SQLite replicas are copies of the primary made with the backup API;
+    # standbys of other databases replicate themselves
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.vendor != 'sqlite':
+        return []
+    primary.ensure_connection()
+    synced = []
+    for alias in aliases or settings.DATABASE_REPLICAS:
+        replica = connections[alias]
+        if replica.vendor != 'sqlite':
+            continue
+        replica.close()
+        target = sqlite3.connect(replica.settings_dict['NAME'], timeout=replica.settings_dict['OPTIONS'].get('timeout', 5))
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        synced.append(alias)
+    return synced
@@ -0,0 +1,149 @@
+import re
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.db import connection
+from django.db.models import Q
+from django.db.transaction import atomic, on_commit
+from core.models import SearchDocument
+from customers.models import Customer, Lead
+from inventory.models import Category, Product
+
+FTS_TABLE = 'core_searchdocument_fts'
+SEARCH_PAGE_SIZE = 30
+# object ids per delete, under SQLite's bound parameter limit
+UNINDEX_BATCH_SIZE = 500
+
+_unindex_batch = ContextVar('unindex_batch', default=None)
+
+
+def product_document(product):
+    return product.name, ' '.join([product.sku, product.category.name, product.specifications])
+
+
+def category_document(category):
+    return category.name, ''
+
+
+def customer_document(customer):
+    return customer.name, ' '.join([customer.email, customer.phone, customer.address])
+
+
+def lead_document(lead):
+    return lead.name, ' '.join(filter(None, [lead.email, lead.phone, lead.address]))
+
+
+SEARCH_MODELS = {
+    'product': (Product, product_document),
+    'category': (Category, category_document),
+    'customer': (Customer, customer_document),
+    'lead': (Lead, lead_document),
+}
+
+
+def kind_for(model):
+    for kind, (search_model, builder) in SEARCH_MODELS.items():
+        if search_model is model:
+            return kind
+    return None
+
+
+def index_objects(kind, objects):
+    builder = SEARCH_MODELS[kind][1]
+    objects = {obj.pk: obj for obj in objects}
+    existing = {doc.object_id: doc for doc in SearchDocument.objects.filter(kind=kind, object_id__in=objects)}
+
+    created = []
+    updated = []
+    for pk, obj in objects.items():
+        title, body = builder(obj)
+        doc = existing.get(pk)
+        if doc is None:
+            created.append(SearchDocument(company_id=obj.company_id, kind=kind, object_id=pk, title=title, body=body))
+        elif (doc.company_id, doc.title, doc.body) != (obj.company_id, title, body):
+            doc.company_id, doc.title, doc.body = obj.company_id, title, body
+            updated.append(doc)
+
+    SearchDocument.objects.bulk_create(created, batch_size=500)
+    SearchDocument.objects.bulk_update(updated, ['company_id', 'title', 'body'], batch_size=500)
+
+
+def unindex_object(kind, pk):
+    SearchDocument.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def unindex_objects(kind, pks):
+    pks = sorted(pks)
+    for start in range(0, len(pks), UNINDEX_BATCH_SIZE):
+        SearchDocument.objects.filter(kind=kind, object_id__in=pks[start:start + UNINDEX_BATCH_SIZE]).delete()
+
+
+@contextmanager
+def unindex_batch():
+    # rows deleted inside have their documents removed together once the
+    # transaction commits, instead of one statement per row from post_delete
+    batch = defaultdict(set)
+    token = _unindex_batch.set(batch)
+    try:
+        yield
+    finally:
+        _unindex_batch.reset(token)
+    for kind, pks in batch.items():
+        on_commit(partial(unindex_objects, kind, pks))
+
+
+def queue_unindex(kind, pk):
+    batch = _unindex_batch.get()
+    if batch is None:
+        on_commit(partial(unindex_object, kind, pk))
+    else:
+        batch[kind].add(pk)
+
+
+def rebuild_index():
+    with atomic():
+        SearchDocument.objects.all().delete()
+        for kind, (model, builder) in SEARCH_MODELS.items():
+            objects = model.objects.all()
+            if model is Product:
+                objects = objects.select_related('category')
+            index_objects(kind, objects)
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def search(company_id, query, offset=0, limit=SEARCH_PAGE_SIZE):
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'sqlite':
+        # each term becomes a quoted prefix query so user input can't inject FTS syntax
+        match = ' '.join('"%s"*' % term for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT d.kind, d.object_id FROM {fts} "
+                "JOIN core_searchdocument d ON d.id = {fts}.rowid "
+                "WHERE {fts} MATCH %s AND d.company_id = %s "
+                "ORDER BY bm25({fts}, 10.0, 1.0) LIMIT %s OFFSET %s".format(fts=FTS_TABLE),
+                [match, company_id, limit, offset])
+            return cursor.fetchall()
+
+    if connection.vendor == 'postgresql':
+        # search_vector is a stored column with a GIN index (core migration 0007)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT kind, object_id FROM core_searchdocument "
+                "WHERE search_vector @@ to_tsquery('simple', %s) AND company_id = %s "
+                "ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, id LIMIT %s OFFSET %s",
+                [' & '.join(term + ':*' for term in terms), company_id,
+                 ' & '.join(term + ':*' for term in terms), limit, offset])
+            return cursor.fetchall()
+
+    documents = SearchDocument.objects.filter(company_id=company_id)
+    for term in terms:
+        documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return list(documents.order_by('id').values_list('kind', 'object_id')[offset:offset + limit])
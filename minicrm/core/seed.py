@@ -0,0 +1,136 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db.transaction import atomic
+from django.utils import timezone
+from accounts.models import Company, CompanyUser, ROLE_CHOICES
+from core.models import Leave, LEAVE_STATUS
+from core.search import rebuild_index
+from customers.models import Customer, Lead, STATUS
+from inventory.models import Category, Product, SOURCE_CHOICES
+from transaction.models import Order, OrderItem, Service, ORDER_STATUS
+from transaction.utils import rebuild_daily_sales
+
+FIRST_NAMES = ['Anu', 'Arjun', 'Devi', 'Farah', 'Joseph', 'Kiran', 'Meera', 'Nikhil', 'Priya', 'Rahul', 'Sara', 'Vivek']
+LAST_NAMES = ['Menon', 'Nair', 'Pillai', 'Thomas', 'Varghese', 'Iyer', 'Khan', 'Das', 'Kurian', 'Rao']
+PRODUCT_WORDS = ['Phone', 'Case', 'Charger', 'Cable', 'Screen', 'Battery', 'Speaker', 'Router', 'Mouse', 'Keyboard']
+PRODUCT_COLOURS = ['Black', 'Blue', 'Red', 'Silver', 'White', 'Green']
+
+DEFAULT_COUNTS = {
+    'users': 2,
+    'customers': 200,
+    'leads': 200,
+    'categories': 10,
+    'products': 200,
+    'orders': 500,
+    'items': 4,
+    'services': 200,
+    'leaves': 50,
+}
+
+
+def person(rng):
+    return "%s %s" % (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+
+
+def phone(rng):
+    return str(rng.randint(7000000000, 9999999999))
+
+
+def moment(rng, days):
+    return timezone.now() - timedelta(days=rng.randint(0, days), seconds=rng.randint(0, 86399))
+
+
+def backdate(model, objects, rng, days):
+    for obj in objects:
+        obj.created_at = moment(rng, days)
+    model.objects.bulk_update(objects, ['created_at'])
+
+
+def seed_company(name, counts, rng, password, days=365):
+    owner = User.objects.create(username=name.lower().replace(' ', '_') + '_owner', password=password)
+    company = Company.objects.create(name=name, address='Seeded', phone=phone(rng), owner=owner)
+
+    users = [owner]
+    memberships = [CompanyUser(user=owner, company=company, role='Admin')]
+    for role, label in ROLE_CHOICES:
+        for x in range(counts['users']):
+            user = User.objects.create(
+                username='%s_%s_%d' % (owner.username[:-6], role.lower(), x), password=password,
+                email='%s.%d.%d@example.com' % (role.lower(), company.id, x))
+            users.append(user)
+            memberships.append(CompanyUser(user=user, company=company, role=role, salary=rng.randint(10000, 90000)))
+    CompanyUser.objects.bulk_create(memberships)
+
+    customers = Customer.objects.bulk_create([
+        Customer(name=person(rng), email='customer%d@example.com' % x, phone=phone(rng), address='Street %d' % x,
+                 created_by=rng.choice(users), company=company)
+        for x in range(counts['customers'])])
+    backdate(Customer, customers, rng, days)
+
+    leads = Lead.objects.bulk_create([
+        Lead(name=person(rng), email='lead%d@example.com' % x, phone=phone(rng), status=rng.choice(STATUS)[0],
+             assigned_to=rng.choice(users), created_by=rng.choice(users), company=company, address='Street %d' % x)
+        for x in range(counts['leads'])])
+    backdate(Lead, leads, rng, days)
+
+    categories = Category.objects.bulk_create([
+        Category(name='%s %s %d' % (company.name, rng.choice(PRODUCT_WORDS), x), company=company)
+        for x in range(counts['categories'])])
+
+    products = []
+    for x in range(counts['products']):
+        buying_price = rng.randint(100, 5000)
+        products.append(Product(
+            name='%s %s %d' % (rng.choice(PRODUCT_COLOURS), rng.choice(PRODUCT_WORDS), x),
+            category=rng.choice(categories), source=rng.choice(SOURCE_CHOICES)[0], buying_price=buying_price,
+            selling_price=buying_price * 1.3, min_selling_price=buying_price * 1.1, sku='SKU-%d-%d' % (company.id, x),
+            stock=rng.choice([0, rng.randint(1, 500)]), created_by=rng.choice(users), company=company))
+    products = Product.objects.bulk_create(products)
+
+    orders = Order.objects.bulk_create([
+        Order(company=company, customer=rng.choice(customers), created_by=rng.choice(users),
+              status=rng.choice(ORDER_STATUS)[0])
+        for x in range(counts['orders'])])
+
+    items = []
+    for order in orders:
+        for x in range(rng.randint(1, counts['items'])):
+            product = rng.choice(products)
+            quantity = rng.randint(1, 5)
+            items.append(OrderItem(order=order, product=product, quantity=quantity, selling_price=product.selling_price,
+                                   profit=(product.selling_price - product.buying_price) * quantity))
+            order.total_amount += product.selling_price * quantity
+            order.total_profit += items[-1].profit
+        order.created_at = moment(rng, days)
+    OrderItem.objects.bulk_create(items)
+    Order.objects.bulk_update(orders, ['total_amount', 'total_profit', 'created_at'])
+
+    Service.objects.bulk_create([
+        Service(company=company, customer=rng.choice(customers), product=rng.choice(products),
+                description='Seeded service', service_type=rng.choice(['Repair', 'Install', 'Warranty']),
+                assigned_to=rng.choice(users), service_date=moment(rng, days).date(), created_by=rng.choice(users),
+                status=rng.choice(ORDER_STATUS)[0])
+        for x in range(counts['services'])])
+
+    leaves = []
+    for x in range(counts['leaves']):
+        start = moment(rng, days).date()
+        leaves.append(Leave(company=company, user=rng.choice(users), leave_type=rng.choice(['Sick', 'Casual']),
+                            start_date=start, end_date=start + timedelta(days=rng.randint(0, 4)),
+                            status=rng.choice(LEAVE_STATUS)[0]))
+    backdate(Leave, Leave.objects.bulk_create(leaves), rng, days)
+
+    rebuild_daily_sales(company.id)
+    return company
+
+
+def seed(companies, counts, prefix='Seed', seed=None, password='password'):
+    rng = random.Random(seed)
+    password = make_password(password)
+    start = Company.objects.filter(name__startswith=prefix + ' ').count()
+    with atomic():
+        created = [seed_company('%s %d' % (prefix, start + x + 1), counts, rng, password) for x in range(companies)]
+    rebuild_index()
+    return created
@@ -0,0 +1,32 @@
+from copy import deepcopy
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+CLEAR_CHUNK_SIZE = 1000
+
+
+class SessionStore(CachedDBStore):
+    # read from the sessions cache and written through to the database, only
+    # when the contents changed rather than whenever a key was assigned
+    def load(self):
+        data = super().load()
+        self._saved = deepcopy(data)
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key and getattr(self, '_saved', None) == self._session:
+            return
+        super().save(must_create)
+        self._saved = deepcopy(self._session)
+
+    @classmethod
+    def clear_expired(cls):
+        # a single DELETE of every expired row locks the table for as long
+        # as it takes; cached copies expire on their own
+        model = cls.get_model_class()
+        expired = model.objects.filter(expire_date__lt=timezone.now()).values_list('session_key', flat=True)
+        while True:
+            keys = list(expired[:CLEAR_CHUNK_SIZE])
+            if not keys:
+                break
+            model.objects.filter(session_key__in=keys).delete()
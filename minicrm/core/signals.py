@@ -0,0 +1,64 @@
+from functools import partial
+from django.db.models.signals import post_save, post_delete
+from django.db.transaction import on_commit
+from django.dispatch import receiver
+from accounts.utils import bump_company_version
+from customers.models import Customer, Lead
+from inventory.models import Category, Product
+from transaction.models import Order
+from core.models import RequestProfile
+from core.search import index_objects, queue_unindex, kind_for
+from core.autocomplete import update_product, update_customer
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_dashboard_version(sender, instance, **kwargs):
+    bump_company_version(instance.company_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Lead)
+def update_search_document(sender, instance, **kwargs):
+    # indexed once the write commits, so a rolled back save leaves the index
+    # alone and the write transaction doesn't wait on it
+    on_commit(partial(reindex, sender, instance))
+
+
+def reindex(sender, instance):
+    index_objects(kind_for(sender), [instance])
+    if sender is Category:
+        index_objects('product', instance.product_set.select_related('category'))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Lead)
+def delete_search_document(sender, instance, **kwargs):
+    queue_unindex(kind_for(sender), instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_product_suggestions(sender, instance, **kwargs):
+    on_commit(partial(update_product, instance, deleted='created' not in kwargs))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def update_customer_suggestions(sender, instance, **kwargs):
+    on_commit(partial(update_customer, instance, deleted='created' not in kwargs))
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_artifacts(sender, instance, **kwargs):
+    for artifact in (instance.stats, instance.report):
+        if artifact.name:
+            on_commit(partial(artifact.storage.delete, artifact.name))
@@ -0,0 +1,254 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.template.utils import get_app_template_dirs
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_TAG = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]""")
+INCLUDE_TAG = re.compile(r"""\{%\s*include\s+['"]([^'"]+)['"]""")
+CSS_REFERENCE = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)|@import\s+['"]([^'"]+)['"]""")
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.eot', '.ttf', '.ico', '.html')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# fingerprinted names never change, anything else may be replaced by the next
+# deploy
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_MAX_AGE = 60
+
+
+def template_dirs():
+    dirs = []
+    for engine in settings.TEMPLATES:
+        dirs.extend(engine.get('DIRS', []))
+    return dirs + list(get_app_template_dirs('templates'))
+
+
+def template_references(dirs=None):
+    names = set()
+    for directory in dirs or template_dirs():
+        for root, subdirs, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    with open(os.path.join(root, filename), encoding='utf-8', errors='replace') as f:
+                        names.update(STATIC_TAG.findall(f.read()))
+    return names
+
+
+def css_references(name, content):
+    for match in CSS_REFERENCE.finditer(content):
+        url = (match.group(1) or match.group(2)).strip()
+        if url.startswith(('data:', '#', '/', 'http:', 'https:')) or '//' in url:
+            continue
+        url = url.split('#')[0].split('?')[0]
+        if url:
+            yield posixpath.normpath(posixpath.join(posixpath.dirname(name), url))
+
+
+def referenced_files(locate, dirs=None):
+    # templates name the files they load; stylesheets pull in fonts, images and
+    # other stylesheets. Everything else in the vendor folders is never
+    # requested, so it isn't collected
+    pending = list(template_references(dirs))
+    found = {}
+    while pending:
+        name = pending.pop()
+        if name in found:
+            continue
+        path = locate(name)
+        if path is None:
+            continue
+        found[name] = path
+        if name.endswith('.css'):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pending.extend(css_references(name, f.read()))
+    return found
+
+
+class ReferencedFilesFinder(FileSystemFinder):
+    # finds any file like FileSystemFinder, but only lists (and so only lets
+    # collectstatic copy) the files the templates end up loading
+    def list(self, ignore_patterns):
+        located = {}
+        for path, storage in super().list(ignore_patterns):
+            located.setdefault(path.replace(os.sep, '/'), (path, storage))
+        def locate(name):
+            if name in located:
+                path, storage = located[name]
+                return storage.path(path)
+
+        for name in referenced_files(locate):
+            yield located[name]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # source maps aren't shipped, so their comments are left alone instead of
+    # failing collectstatic on the missing .map files
+    patterns = tuple(
+        (extension, tuple(pattern for pattern in extension_patterns if 'sourceMappingURL' not in str(pattern)))
+        for extension, extension_patterns in ManifestStaticFilesStorage.patterns
+        if extension == '*.css'
+    )
+
+    def stored_name(self, name):
+        # without a manifest (tests, or before the first collectstatic) pages
+        # still render, with the plain names
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            if name.endswith(COMPRESSED_EXTENSIONS) and self.exists(name):
+                compress_file(self.path(name))
+
+
+def compress_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    for extension, compressed in variants:
+        # not worth a second request header for a few saved bytes
+        if len(compressed) < len(data) * 0.95:
+            with open(path + extension, 'wb') as f:
+                f.write(compressed)
+
+
+def accepted_encodings(header):
+    # Accept-Encoding as {coding: q}; "*" stands for the codings it doesn't name
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def immutable_names():
+    return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+class StaticFilesMiddleware:
+    # serves collected files with their precompressed variants, so static
+    # files don't depend on DEBUG or a separate web server
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.immutable = immutable_names()
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+            return self.get_response(request)
+        name = request.path[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name) if settings.STATIC_ROOT else None
+            if path is None or not os.path.isfile(path):
+                path = finders.find(name)
+        except SuspiciousFileOperation:
+            path = None
+        if not path or name.endswith(('.gz', '.br')):
+            return self.get_response(request)
+        return self.serve(request, name, path)
+
+    def serve(self, request, name, path):
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = None
+        served = path
+        compressed = False
+        for candidate, extension in ENCODINGS:
+            if os.path.isfile(path + extension):
+                compressed = True
+                if encoding is None and accepted.get(candidate, accepted.get('*', 0)) > 0:
+                    encoding = candidate
+                    served = path + extension
+
+        response = FileResponse(open(served, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if compressed:
+            response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if name in self.immutable:
+            response['Cache-Control'] = 'public, max-age=%d, immutable' % IMMUTABLE_MAX_AGE
+        else:
+            response['Cache-Control'] = 'public, max-age=%d' % STATIC_MAX_AGE
+        return response
+
+
+def page_references(template, seen=None):
+    # static files a template and the templates it includes name
+    seen = seen if seen is not None else set()
+    if template in seen:
+        return set()
+    seen.add(template)
+    for directory in template_dirs():
+        path = os.path.join(directory, template)
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                content = f.read()
+            break
+    else:
+        return set()
+    names = set(STATIC_TAG.findall(content))
+    for included in INCLUDE_TAG.findall(content):
+        names |= page_references(included, seen)
+    return names
+
+
+def first_load(template='base.html'):
+    # bytes a browser with an empty cache downloads for the assets a page
+    # names directly, as the original files and as served now
+    rows = []
+    for name in sorted(page_references(template)):
+        source = finders.find(name)
+        if source is None:
+            continue
+        served = staticfiles_storage.path(staticfiles_storage.stored_name(name))
+        sizes = [os.path.getsize(served + extension) for encoding, extension in ENCODINGS
+                 if os.path.isfile(served + extension)]
+        if os.path.isfile(served):
+            sizes.append(os.path.getsize(served))
+        rows.append((name, os.path.getsize(source), min(sizes) if sizes else None))
+    return rows
+
+
+def directory_size(directory, skip=()):
+    total = 0
+    for root, subdirs, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, filename)) for filename in files
+                     if not filename.endswith(skip))
+    return total
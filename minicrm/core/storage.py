@@ -0,0 +1,51 @@
+import hashlib
+import os
+from django.core.files.storage import FileSystemStorage
+from core.models import StoredFile
+from core.writes import write_atomic
+from inventory.images import VARIANT_DIR
+
+CONTENT_DIR = 'cas'
+
+
+def content_name(content, name):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(name)[1].lower()
+    return '%s/%s/%s/%s%s' % (CONTENT_DIR, digest[:2], digest[2:4], digest, extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # uploads are stored under the sha256 of their bytes, so the same image
+    # uploaded for several products, categories or companies is kept once and
+    # a stored file never changes; references are counted in core.media.
+    # Image variants are derived from a stored name, so they keep theirs
+    def get_available_name(self, name, max_length=None):
+        if name.startswith(VARIANT_DIR + '/'):
+            return super().get_available_name(name, max_length)
+        if name.startswith(CONTENT_DIR + '/') and self.exists(name):
+            # FileSystemStorage._save asks again after losing a race to create
+            # the file; the name can't change, so stop it retrying forever
+            raise FileExistsError(name)
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(VARIANT_DIR + '/'):
+            return super()._save(name, content)
+        name = content_name(content, name)
+        with write_atomic():
+            # waits for core.media.delete_unreferenced if it is removing these
+            # bytes; callers saving inside a transaction keep the lock until
+            # their reference is counted
+            StoredFile.objects.select_for_update().filter(name=name).first()
+            if self.exists(name):
+                return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            # the same bytes were saved by a concurrent upload
+            return name
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from accounts.models import Company, CompanyUser
+
+
+class CompanyTestMixin:
+    # an Admin of the Acme company, logged in with it as the current company
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('admin', 'admin@example.com', 'password')
+        self.company = Company.objects.create(name='Acme', address='Street', phone=1, owner=self.user)
+        self.membership = CompanyUser.objects.create(user=self.user, company=self.company, role='Admin')
+        self.login(self.user)
+
+    def login(self, user, client=None):
+        client = client or self.client
+        client.force_login(user)
+        session = client.session
+        session['company_id'] = self.company.id
+        session.save()
+
+
+class QueryPlanMixin:
+    # plans are SQLite EXPLAIN QUERY PLAN output; before the company indexes
+    # every list was a search on the bare company_id index and a temp B-tree
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
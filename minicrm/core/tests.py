@@ -1,3 +1,667 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.db import connection
+from django.db.transaction import atomic
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from accounts.models import Company, CompanyUser
+from core.models import Job, Leave, RequestProfile, SearchDocument, StoredFile
+from core.testing import CompanyTestMixin, QueryPlanMixin
+from core.seed import seed
+from core.benchmark import benchmark_company, run_benchmark
+from core.middleware import RequestMetrics, current_metrics, sql_shape
+from core.profiling import make_profile_token
+from core.metrics import registry
+from core.writes import WriteQueue, write_queue
+from core.replicas import PIN_SESSION_KEY, ReadState, ReplicaMiddleware, ReplicaRouter, current_reads
+from core.views import DashboardView
+from core.utils import get_dashboard_stats
+from core.storage import ContentAddressedStorage
+from core.sessions import SessionStore
+from core.queries import gather_queries
+from core.jobs import claim_job, enqueue, job, run_pending_jobs
+from core.pagination import encode_cursor, paginate
+from core.search import search
+from core import autocomplete
+from customers.models import Customer, Lead
+from inventory.models import Category, Product
 
-# Create your tests here.
+
+calls = []
+
+
+@job(max_attempts=2)
+def flaky_job(label, company_id=None):
+    calls.append(label)
+    if label == 'broken':
+        raise ValueError(label)
+
+
+class LeaveListTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.get('/core/leaves/')
+
+    def add_leaves(self, count):
+        for x in range(count):
+            staff = User.objects.create_user('staff%d' % User.objects.count())
+            CompanyUser.objects.create(user=staff, company=self.company, role='Staff')
+            Leave.objects.create(
+                company=self.company, user=staff, leave_type='Sick', start_date='2025-01-01',
+                end_date='2025-01-02')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/core/leaves/')
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_bounded_queries(self):
+        self.add_leaves(1)
+        few = self.count_queries()
+        self.add_leaves(10)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_role_is_company_role(self):
+        self.add_leaves(1)
+        response = self.client.get('/core/leaves/')
+        self.assertEqual(response.context['leaves'].object_list[0].role, 'Staff')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTest(CompanyTestMixin, QueryPlanMixin, TestCase):
+    def test_leave_list(self):
+        self.assertUsesIndex(
+            Leave.objects.for_company(self.company.id).order_by('-created_at', '-id')[:31],
+            'leave_company_created_idx')
+
+
+class BenchmarkTest(TestCase):
+    def test_every_route_renders_on_seeded_data(self):
+        counts = {'users': 1, 'customers': 5, 'leads': 5, 'categories': 2, 'products': 5, 'orders': 5,
+                  'items': 2, 'services': 3, 'leaves': 3}
+        company = seed(1, counts, seed=1)[0]
+        self.assertEqual(company.order_set.count(), 5)
+
+        results = run_benchmark(company, company.owner, repeat=1, host='testserver')['results']
+        measured = {name: result for name, result in results.items() if not result.get('skipped')}
+        self.assertIn('core:dashboard', measured)
+        for name, result in measured.items():
+            self.assertLess(result['status'], 500, name)
+
+    def test_company_and_member_resolution(self):
+        company = seed(1, {'users': 1, 'customers': 0, 'leads': 0, 'categories': 0, 'products': 0, 'orders': 0,
+                           'items': 0, 'services': 0, 'leaves': 0}, seed=1)[0]
+        self.assertEqual(benchmark_company(), (company, company.owner))
+        with self.assertRaises(CommandError):
+            benchmark_company(company.id, 'nobody')
+
+
+class RequestMetricsTest(CompanyTestMixin, TestCase):
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/core/leaves/')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="%d queries"' % len(context.captured_queries), timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertNotIn('tpl;dur=0.0', timing)
+
+    @override_settings(SLOW_REQUEST_QUERY_BUDGET=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('minicrm.slow_requests') as logs:
+            self.client.get('/core/leaves/')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'core:leave_list')
+        self.assertGreater(entry['queries'], 0)
+
+    def test_sql_shape(self):
+        self.assertEqual(
+            sql_shape('SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = 5'),
+            'SELECT "a" FROM "t" WHERE "id" IN (...) AND "x" = ?')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfilingTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        storage = RequestProfile._meta.get_field('stats').storage
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = patch.object(storage, 'location', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_profiles_signed_requests(self):
+        response = self.client.get('/core/leaves/', {'profile': make_profile_token(self.user)})
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.path, '/core/leaves/')
+
+        report = self.client.get('/core/profiles/%d/report/' % profile.pk)
+        self.assertIn(b'Top allocations', b''.join(report.streaming_content))
+
+    def test_artifacts_are_private(self):
+        self.client.get('/core/leaves/', {'profile': make_profile_token(self.user)})
+        profile = RequestProfile.objects.get()
+        self.assertFalse(default_storage.exists(profile.report.name))
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertEqual(self.client.get(settings.MEDIA_URL + profile.report.name).status_code, 404)
+
+        storage, name = profile.report.storage, profile.report.name
+        self.assertTrue(storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_ignores_bad_tokens_and_non_admins(self):
+        self.client.get('/core/leaves/', {'profile': 'nope'})
+        self.client.get('/core/leaves/', HTTP_X_PROFILE=make_profile_token(self.user) + 'x')
+        self.membership.role = 'Staff'
+        self.membership.save()
+        self.client.get('/core/leaves/', {'profile': make_profile_token(self.user)})
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_profile_link(self):
+        response = self.client.get('/core/profiles/', {'path': '/core/dashboard/'})
+        self.assertTrue(response['Location'].startswith('/core/dashboard/?profile='))
+        response = self.client.get('/core/profiles/', {'path': 'https://example.com/'})
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        override = override_settings(METRICS_DIR=self.directory, METRICS_TOKEN='secret')
+        override.enable()
+        self.addCleanup(override.disable)
+        registry.counters.clear()
+        registry.histograms.clear()
+        cache.clear()
+        super().setUp()
+
+    def test_aggregates_workers(self):
+        self.client.get('/core/dashboard/')
+        self.client.get('/core/dashboard/')
+        with open(os.path.join(self.directory, '999999.json'), 'w') as f:
+            json.dump({'counters': [['minicrm_requests_total',
+                                     [['method', 'GET'], ['status', '2xx'], ['view', 'core:dashboard']], 3]],
+                       'histograms': []}, f)
+
+        body = self.scrape().content.decode()
+        self.assertIn('minicrm_requests_total{method="GET",status="2xx",view="core:dashboard"} 5.0', body)
+        self.assertIn('minicrm_request_duration_seconds_count{view="core:dashboard"} 2', body)
+        self.assertIn('minicrm_cache_requests_total{cache="dashboard",result="hit"} 1.0', body)
+
+    def test_exited_workers_are_folded_in(self):
+        self.client.get('/core/dashboard/')
+        with open(os.path.join(self.directory, '999999.json'), 'w') as f:
+            json.dump({'counters': [['minicrm_requests_total',
+                                     [['method', 'GET'], ['status', '2xx'], ['view', 'core:dashboard']], 3]],
+                       'histograms': [['minicrm_request_duration_seconds', [['view', 'core:dashboard']],
+                                       [0] * 11 + [2, 0.5]]]}, f)
+        with patch('core.metrics.pid_running', lambda pid: pid != 999999):
+            self.scrape()
+        self.assertEqual(os.listdir(self.directory), ['%d.json' % os.getpid()])
+        body = self.scrape().content.decode()
+        self.assertIn('minicrm_requests_total{method="GET",status="2xx",view="core:dashboard"} 4.0', body)
+        self.assertIn('minicrm_request_duration_seconds_count{view="core:dashboard"} 3', body)
+
+    def scrape(self, **headers):
+        headers.setdefault('HTTP_AUTHORIZATION', 'Bearer secret')
+        return self.client.get('/core/metrics/', **headers)
+
+    def test_token_required(self):
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='').status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.1').status_code, 200)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.scrape().status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION='').status_code, 200)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ContentStorageTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Cases', company=self.company)
+
+    def product(self, name, content):
+        return Product.objects.create(
+            name='Case', category=self.category, source='Bought', selling_price=10, company=self.company,
+            image=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_stored_once(self):
+        first = self.product('case.png', b'same bytes')
+        second = self.product('case.png', b'same bytes')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('cas/'))
+        self.assertEqual(StoredFile.objects.get(name=first.image.name).references, 2)
+
+        first.delete()
+        self.assertTrue(default_storage.exists(second.image.name))
+        name, pk = second.image.name, second.pk
+        with self.assertRaises(ValueError), atomic():
+            second.delete()
+            raise ValueError
+        self.assertTrue(default_storage.exists(name))
+
+        second = Product.objects.get(pk=pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = SimpleUploadedFile('other.png', b'other bytes')
+            second.save()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_losing_an_upload_race_returns_the_stored_name(self):
+        first = default_storage.save('case.png', ContentFile(b'raced bytes'))
+        with patch.object(ContentAddressedStorage, 'exists', side_effect=[False, True]):
+            second = default_storage.save('case.png', ContentFile(b'raced bytes'))
+        self.assertEqual(first, second)
+
+    def test_reupload_before_delete_keeps_the_file(self):
+        product = self.product('case.png', b'bytes')
+        name = product.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            product.delete()
+        self.product('again.png', b'bytes')
+        for callback in callbacks:
+            callback()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    def test_immutable_headers(self):
+        product = self.product('case.png', b'bytes')
+        response = self.client.get(product.image.url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+
+@override_settings(DEBUG=False)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.static_settings = override_settings(STATIC_ROOT=cls.static_root.name)
+        cls.static_settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.static_settings.disable()
+        cls.static_root.cleanup()
+        super().tearDownClass()
+
+    def test_only_referenced_files_are_collected(self):
+        collected = set(json.load(open(os.path.join(settings.STATIC_ROOT, 'staticfiles.json')))['paths'])
+        self.assertIn('vendors/feather/feather.css', collected)
+        self.assertIn('vendors/feather/fonts/feather-webfont.woff', collected)
+        self.assertNotIn('vendors/tinymce/tinymce.min.js', collected)
+
+    def test_fingerprinted_files_are_served_compressed_and_immutable(self):
+        url = staticfiles_storage.url('css/custom.css')
+        self.assertNotEqual(url, '/static/css/custom.css')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn(b'{', b''.join(response.streaming_content))
+
+    def test_refused_encodings_are_not_served(self):
+        url = staticfiles_storage.url('css/custom.css')
+        for header, encoding in [('gzip;q=0', None), ('br;q=0, gzip', 'gzip'), ('*;q=0', None),
+                                 ('GZIP ; q=0.5', 'gzip'), ('*, br;q=0', 'gzip'), ('x-gzip', None), ('gzip;q=x', None)]:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response.get('Content-Encoding'), encoding, header)
+
+    def test_unfingerprinted_names_are_not_immutable(self):
+        response = self.client.get('/static/css/custom.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class LayoutCacheTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.staff = User.objects.create_user('staff')
+        CompanyUser.objects.create(user=self.staff, company=self.company, role='Staff')
+
+    def get(self, user, url='/core/dashboard/'):
+        self.login(user)
+        return self.client.get(url)
+
+    def test_fragments_are_keyed_by_role(self):
+        self.assertContains(self.get(self.user), 'User Management')
+        self.assertNotContains(self.get(self.staff), 'User Management')
+        self.assertContains(self.get(self.user), 'User Management')
+
+    def test_search_value_is_not_cached(self):
+        self.get(self.user, '/core/search/?q=first')
+        self.assertContains(self.get(self.user, '/core/search/?q=second'), 'value="second"')
+
+
+class WriteQueueTest(TestCase):
+    def test_writers_take_turns_in_arrival_order(self):
+        queue = WriteQueue(os.path.join(tempfile.mkdtemp(), 'db-writelock'))
+        order = []
+        queue.acquire()
+        queue.acquire()
+        threads = []
+        for number in range(5):
+            thread = threading.Thread(target=lambda number=number: (queue.acquire(), order.append(number), queue.release()))
+            thread.start()
+            threads.append(thread)
+            while queue.next_ticket < number + 2:
+                time.sleep(0.001)
+        queue.release()
+        self.assertEqual(order, [])
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_in_memory_databases_are_not_queued(self):
+        self.assertIsNone(write_queue())
+
+
+class ReplicaRoutingTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaMiddleware(lambda request: None)
+        self.state = ReadState()
+        self.token = current_reads.set(self.state)
+        self.addCleanup(current_reads.reset, self.token)
+
+    def view_request(self, session):
+        request = RequestFactory().get('/core/dashboard/')
+        request.session = session
+        self.middleware.process_view(request, DashboardView.as_view(), (), {})
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_marked_views_read_from_a_replica_until_they_write(self):
+        self.view_request({})
+        self.assertEqual(self.router.db_for_read(Lead), 'replica1')
+        self.assertEqual(self.router.db_for_write(Lead), 'default')
+        self.assertIsNone(self.router.db_for_read(Lead))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_pinned_sessions_read_from_the_primary(self):
+        self.view_request({PIN_SESSION_KEY: time.time() + 10})
+        self.assertIsNone(self.router.db_for_read(Lead))
+
+    def test_dashboard_cache_key_uses_the_version_read_with_the_stats(self):
+        # request.company comes from the primary, which can be ahead of the replica
+        version = self.company.data_version
+        self.company.data_version = version + 5
+        cache.clear()
+        get_dashboard_stats(self.company, 2026)
+        self.assertIsNotNone(cache.get('dashboard:%d:%d:2026' % (self.company.id, version)))
+        self.assertIsNone(cache.get('dashboard:%d:%d:2026' % (self.company.id, version + 5)))
+
+    def test_writes_pin_the_session(self):
+        self.client.get('/core/dashboard/')
+        self.assertNotIn(PIN_SESSION_KEY, self.client.session)
+        self.client.post('/core/leavesnew/', {'leave_type': 'Sick', 'reason': 'Flu', 'start_date': '2026-01-01', 'end_date': '2026-01-02'})
+        self.assertGreater(self.client.session[PIN_SESSION_KEY], time.time())
+
+
+class SessionStoreTest(CompanyTestMixin, TestCase):
+    def test_cached_sessions_skip_the_session_table(self):
+        self.client.get('/core/dashboard/')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/core/dashboard/')
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    def test_unchanged_sessions_are_not_written(self):
+        session = SessionStore()
+        session['company_id'] = 1
+        session.save()
+
+        session = SessionStore(session.session_key)
+        session['company_id'] = 1
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(len(queries), 0)
+
+        session['company_id'] = 2
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertTrue(queries)
+        self.assertEqual(SessionStore(session.session_key)['company_id'], 2)
+
+    def test_nested_changes_are_written(self):
+        session = SessionStore()
+        session['recent'] = [1]
+        session.save()
+
+        session = SessionStore(session.session_key)
+        session['recent'].append(2)
+        session.modified = True
+        session.save()
+        self.assertEqual(SessionStore(session.session_key)['recent'], [1, 2])
+
+    @patch('core.sessions.CLEAR_CHUNK_SIZE', 2)
+    def test_expired_sessions_are_cleared_in_chunks(self):
+        for x in range(5):
+            session = SessionStore()
+            session.set_expiry(-60)
+            session.save()
+        kept = SessionStore()
+        kept.save()
+
+        SessionStore.clear_expired()
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)),
+                         {kept.session_key, self.client.session.session_key})
+
+
+class GatherQueriesTest(SimpleTestCase):
+    databases = {'default'}
+
+    def test_functions_run_at_the_same_time_outside_transactions(self):
+        started = time.perf_counter()
+        results = async_to_sync(gather_queries)(*[lambda number=number: time.sleep(0.2) or number for number in range(4)])
+        self.assertEqual(results, [0, 1, 2, 3])
+        self.assertLess(time.perf_counter() - started, 0.6)
+
+    def test_pool_queries_count_towards_the_request(self):
+        def query():
+            User.objects.exists()
+            return threading.get_ident()
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            threads = async_to_sync(gather_queries)(query, query, query)
+        finally:
+            current_metrics.reset(token)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(metrics.queries, 3)
+
+
+class AsyncViewTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Jane Phone', email='jane@example.com', phone='1', company=self.company)
+
+    def test_dashboard_search_and_service_form(self):
+        response = self.client.get('/core/dashboard/')
+        self.assertEqual(response.context['total_customers'], 1)
+        self.assertContains(self.client.get('/core/search/?q=jane'), 'Jane Phone')
+        self.assertContains(self.client.get('/transaction/services_add/'), 'Jane Phone')
+
+
+class JobTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        calls.clear()
+        super().setUp()
+        self.other = Company.objects.create(name='Other', address='Street', phone=2, owner=self.user)
+
+    def test_retries_then_fails(self):
+        enqueue(flaky_job, label='broken')
+        run_pending_jobs()
+        failed = Job.objects.get()
+        self.assertEqual((failed.status, failed.attempts), ('Queued', 1))
+        self.assertIn('ValueError', failed.last_error)
+
+        Job.objects.update(run_at=failed.created_at)
+        run_pending_jobs()
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('Failed', 2))
+        self.assertEqual(calls, ['broken', 'broken'])
+
+    def test_priority_then_fewest_running_company_first(self):
+        enqueue(flaky_job, company_id=self.company.id, label='busy')
+        enqueue(flaky_job, company_id=self.company.id, label='busy')
+        enqueue(flaky_job, company_id=self.other.id, label='other')
+        enqueue(flaky_job, company_id=self.company.id, priority=5, label='urgent')
+
+        claimed = [claim_job('test').arguments['label'] for _ in range(4)]
+        self.assertEqual(claimed, ['urgent', 'other', 'busy', 'busy'])
+
+    def test_status_page(self):
+        enqueue(flaky_job, company_id=self.company.id, label='broken')
+        run_pending_jobs()
+        response = self.client.get('/core/jobs/?status=Queued')
+        self.assertContains(response, 'core.tests.flaky_job')
+        self.assertContains(response, 'ValueError: broken')
+
+
+class PaginationTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        leads = Lead.objects.bulk_create([
+            Lead(name='Lead %d' % x, address='Street', company=self.company) for x in range(7)])
+        # a non-unique sort key: four leads share the same created_at
+        Lead.objects.filter(id__in=[lead.id for lead in leads[1:5]]).update(created_at=leads[0].created_at)
+        self.ordering = ('-created_at', '-id')
+        self.expected = list(Lead.objects.order_by(*self.ordering).values_list('id', flat=True))
+
+    def page(self, **params):
+        request = RequestFactory().get('/', params)
+        return paginate(request, Lead.objects.for_company(self.company.id), self.ordering, per_page=3)
+
+    def test_next_and_previous_pages_with_ties(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(after=pages[-1].next_cursor))
+        self.assertEqual([lead.id for page in pages for lead in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        previous = self.page(before=pages[2].previous_cursor)
+        self.assertEqual([lead.id for lead in previous], [lead.id for lead in pages[1]])
+        self.assertTrue(previous.has_previous)
+        first = self.page(before=previous.previous_cursor)
+        self.assertEqual([lead.id for lead in first], self.expected[:3])
+        self.assertFalse(first.has_previous)
+
+    def test_tampered_cursor_shows_first_page(self):
+        for cursor in [encode_cursor(['abc', 1]), encode_cursor([{}, 1]), encode_cursor([None, None]),
+                       encode_cursor([1]), encode_cursor({'id': 1}), 'not base64!', 'WyJhYmMiXQ==']:
+            for direction in ('after', 'before'):
+                page = self.page(**{direction: cursor})
+                self.assertEqual([lead.id for lead in page], self.expected[:3], cursor)
+
+
+class SearchTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Company.objects.create(name='Other', address='Street', phone=2, owner=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer = Customer.objects.create(name='Jane Phone', email='jane@example.com', phone='1',
+                                                    company=self.company)
+            Customer.objects.create(name='Jane Other', email='jane@other.com', phone='2', company=self.other)
+
+    def found(self, query, company=None):
+        return search((company or self.company).id, query)
+
+    def test_user_input_cannot_inject_match_syntax(self):
+        for query in ['jane" OR other', 'NEAR(jane', 'jane*', '-jane', '"', '* ^ :', 'title:jane']:
+            self.assertIn(self.found(query), [[], [('customer', self.customer.id)]], query)
+        self.assertEqual(self.found('jane" OR "other'), [])
+        self.assertEqual(self.found('jan'), [('customer', self.customer.id)])
+
+    def test_results_are_scoped_to_the_company(self):
+        self.assertEqual(self.found('jane'), [('customer', self.customer.id)])
+        self.assertEqual(len(self.found('jane', self.other)), 1)
+        self.assertNotIn(('customer', self.customer.id), self.found('jane', self.other))
+
+    def test_index_follows_saves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.name, self.customer.email = 'Joan Phone', 'joan@example.com'
+            self.customer.save()
+        self.assertEqual(self.found('jane'), [])
+        self.assertEqual(self.found('joan'), [('customer', self.customer.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.delete()
+        self.assertEqual(self.found('joan'), [])
+        self.assertFalse(SearchDocument.objects.filter(kind='customer', object_id=self.customer.id).exists())
+
+    def test_uncommitted_saves_are_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Customer.objects.create(name='Rolled Back', email='rb@example.com', phone='3', company=self.company)
+        self.assertEqual(self.found('rolled'), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(self.found('rolled')), 1)
+
+
+class AutocompleteTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jane = Customer.objects.create(name='Jane Phone', email='jane@example.com', phone='555',
+                                                company=self.company)
+        autocomplete._indexes.clear()
+        self.addCleanup(autocomplete._indexes.clear)
+
+    def labels(self, query):
+        return [result['label'] for result in autocomplete.autocomplete(self.company.id, query)]
+
+    def test_local_writes_apply_on_commit(self):
+        self.assertEqual(self.labels('ja'), ['Jane Phone (555)'])
+        index = autocomplete._indexes[self.company.id]
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Customer.objects.create(name='Jack', email='jack@example.com', phone='556', company=self.company)
+        self.assertEqual(len(index.lookup('ja')), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual([result['label'] for result in index.lookup('ja')], ['Jack (556)', 'Jane Phone (555)'])
+
+    def test_other_workers_writes_refresh_incrementally(self):
+        self.labels('ja')
+        # saved elsewhere: this process's index only sees the new data_version
+        with patch('core.signals.update_customer'), self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(name='Jack', email='jack@example.com', phone='556', company=self.company)
+            self.jane.delete()
+        with patch('core.autocomplete.build_index', side_effect=AssertionError):
+            self.assertEqual(self.labels('ja'), ['Jack (556)'])
+            with self.assertNumQueries(1):
+                self.assertEqual(self.labels('55'), ['Jack (556)'])
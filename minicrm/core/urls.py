@@ -26,5 +26,10 @@ urlpatterns = [
     path('leavesnew/', views.LeaveCreate.as_view(), name='leave_create'),
     path('leaves/<int:pk>/<str:action>/', views.LeaveAction.as_view(), name='leave_action'),
     path('search/', views.GlobalSearchView.as_view(), name='global_search'),
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
+    path('profiles/', views.ProfileList.as_view(), name='profile_list'),
+    path('jobs/', views.JobList.as_view(), name='job_list'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('profiles/<int:pk>/<str:kind>/', views.ProfileDownload.as_view(), name='profile_download'),
 ]
 
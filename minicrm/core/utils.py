@@ -0,0 +1,77 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, Coalesce
+from accounts.models import Company
+from customers.models import Customer
+from inventory.models import Product
+from transaction.models import DailySales
+from core.metrics import record_cache
+from core.queries import gather_queries
+
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+
+def dashboard_version(company_id):
+    # read from the database the stats come from: a lagging replica's numbers
+    # must not be cached under the primary's newer version
+    return Company.objects.filter(id=company_id).values_list('data_version', flat=True).first()
+
+
+def get_dashboard_stats(company, year):
+    # keyed by the company's data_version, which every Order/Customer/Product
+    # write bumps, so a cached entry is never stale - it just stops being read
+    key = 'dashboard:%s:%s:%s' % (company.id, dashboard_version(company.id), year)
+    stats = cache.get(key)
+    record_cache('dashboard', stats is not None)
+    if stats is None:
+        stats = compute_dashboard_stats(company.id, year)
+        cache.set(key, stats, DASHBOARD_CACHE_TIMEOUT)
+    return stats
+
+
+def dashboard_queries(company_id, year):
+    return [
+        lambda: DailySales.objects.filter(company_id=company_id).aggregate(
+            total_orders=Coalesce(Sum('orders'), 0),
+            pending_orders=Coalesce(Sum('pending'), 0)),
+        lambda: list(DailySales.objects.filter(company_id=company_id, day__year=year)
+            .annotate(month=ExtractMonth('day'))
+            .values('month')
+            .annotate(total_orders=Sum('orders'))
+            .order_by('month')),
+        lambda: Customer.objects.for_company(company_id).count(),
+        lambda: Product.objects.for_company(company_id).out_of_stock().count(),
+    ]
+
+
+def dashboard_stats(totals, orders, total_customers, out_of_stock):
+    data = [0] * 12
+    for o in orders:
+        data[o['month'] - 1] = o['total_orders']
+
+    return {
+        'total_orders': totals['total_orders'],
+        'pending_orders': totals['pending_orders'],
+        'total_customers': total_customers,
+        'out_of_stock': out_of_stock,
+        'data': data,
+    }
+
+
+def compute_dashboard_stats(company_id, year):
+    return dashboard_stats(*[query() for query in dashboard_queries(company_id, year)])
+
+
+async def acompute_dashboard_stats(company_id, year):
+    return dashboard_stats(*await gather_queries(*dashboard_queries(company_id, year)))
+
+
+async def aget_dashboard_stats(company, year):
+    key = 'dashboard:%s:%s:%s' % (company.id, await sync_to_async(dashboard_version)(company.id), year)
+    stats = await cache.aget(key)
+    record_cache('dashboard', stats is not None)
+    if stats is None:
+        stats = await acompute_dashboard_stats(company.id, year)
+        await cache.aset(key, stats, DASHBOARD_CACHE_TIMEOUT)
+    return stats
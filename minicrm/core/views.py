@@ -1,33 +1,46 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+import os
+from urllib.parse import urlencode
+from django.http import JsonResponse, FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.static import serve
 from django.views import View
-from django.db.models.functions import ExtractMonth
 from django.db.models import Count
 from django.contrib import messages
-from datetime import datetime
-from django.db.models import Q
-from accounts.models import CompanyUser,Company
+from django.db.models import OuterRef, Subquery
+from accounts.models import CompanyUser
 from accounts.utils import get_user_company, get_user_role
 from inventory.models import Product,Category
-from customers.models import Customer
-from transaction.models import Order
-from core.models import Leave
+from customers.models import Customer, Lead
+from core.models import Leave, RequestProfile, Job, JOB_STATUS
 from core.forms import LeaveForm
+from core.pagination import paginate
+from core.utils import aget_dashboard_stats, acompute_dashboard_stats
+from core.queries import gather_queries
+from core.search import search, SEARCH_MODELS, SEARCH_PAGE_SIZE
+from core.autocomplete import autocomplete
+from core.profiling import make_profile_token, PROFILE_PARAM
+from core.metrics import render_metrics
 
 
 from django.utils import timezone
-from django.db.models.functions import ExtractMonth, ExtractYear
-from django.db.models import Count
+
 
 class DashboardView(View):
-    def get(self, request):
+    replica_reads = True
+
+    async def get(self, request):
 
         company_id = get_user_company(request)
-        role = get_user_role(request, company_id)
+        role = await sync_to_async(get_user_role)(request, company_id)
 
         if not company_id:
             return redirect('accounts:select_company')
 
-        company = Company.objects.filter(id=company_id).first()
+        company = await sync_to_async(lambda: request.company or None)()
         if company:
             company_name = company.name
         else:
@@ -37,22 +50,13 @@ class DashboardView(View):
         selected_year = int(request.GET.get("year", current_year))
         year_options = list(range(current_year, current_year - 5, -1))
 
-        total_orders = Order.objects.filter(company_id=company_id).count()
-        total_customers = Customer.objects.filter(company_id=company_id).count()
-        pending_orders = Order.objects.filter(company_id=company_id, status='Pending').count()
-        out_of_stock = Product.objects.filter(company_id=company_id, stock=0).count()
-
-        orders = (Order.objects.filter(company_id=company_id, created_at__year=selected_year)
-            .annotate(month=ExtractMonth('created_at'))
-            .values('month')
-            .annotate(total_orders=Count('id'))
-            .order_by('month'))
+        if company:
+            stats = await aget_dashboard_stats(company, selected_year)
+        else:
+            stats = await acompute_dashboard_stats(company_id, selected_year)
 
         month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        data = [0] * 12
-
-        for o in orders:
-            data[o['month'] - 1] = o['total_orders']
+        data = stats['data']
 
         chart_data = zip(month_names, data)
 
@@ -65,12 +69,12 @@ class DashboardView(View):
             'chart_data': chart_data,
             'selected_year': selected_year,
             'year_options': year_options,
-            'total_orders': total_orders,
-            'total_customers': total_customers,
-            'pending_orders': pending_orders,
-            'out_of_stock': out_of_stock,
+            'total_orders': stats['total_orders'],
+            'total_customers': stats['total_customers'],
+            'pending_orders': stats['pending_orders'],
+            'out_of_stock': stats['out_of_stock'],
         }
-        return render(request, 'dashboard.html', context)
+        return await sync_to_async(render)(request, 'dashboard.html', context)
 
 class LeaveList(View):
     def get(self, request):
@@ -78,9 +82,13 @@ class LeaveList(View):
         role = get_user_role(request, company_id)
 
         if role in ['Admin', 'Manager']:
-            leaves = Leave.objects.filter(company_id=company_id).select_related('user').order_by('-created_at')
+            leaves = Leave.objects.for_company(company_id)
         else:
-            leaves = Leave.objects.filter(company_id=company_id, user=request.user).order_by('-created_at')
+            leaves = Leave.objects.for_company(company_id).filter(user=request.user)
+
+        leaves = leaves.select_related('user').annotate(role=Subquery(
+            CompanyUser.objects.filter(user=OuterRef('user'), company_id=OuterRef('company_id')).values('role')[:1]))
+        leaves = paginate(request, leaves, ('-created_at', '-id'))
 
         return render(request, 'leave_list.html', {'leaves': leaves, 'role': role})
 
@@ -112,7 +120,7 @@ class LeaveAction(View):
             messages.error(request, "You don't have permission to perform this action.")
             return redirect('core:leave_list')
 
-        leave = get_object_or_404(Leave, pk=pk, company_id=company_id)
+        leave = get_object_or_404(Leave.objects.for_company(company_id), pk=pk)
         if action == 'approve':
             leave.status = 'Approved'
         elif action == 'reject':
@@ -123,40 +131,132 @@ class LeaveAction(View):
         return redirect('core:leave_list')
 
 class GlobalSearchView(View):
-    def get(self, request):
+    replica_reads = True
+
+    async def get(self, request):
         company_id = get_user_company(request)
-        role = get_user_role(request, company_id)
+        role = await sync_to_async(get_user_role)(request, company_id)
 
         query = request.GET.get('q')
-        products = []
-        categories = []
-        customers = []
-
-        if query:
-            products = Product.objects.filter(
-                Q(name__icontains=query)
-                | Q(category__name__icontains=query),
-            company_id = company_id
-            ).distinct()
-
-            categories = Category.objects.filter(
-                Q(name__icontains=query),
-                company_id=company_id
-            ).distinct()
-
-            customers = Customer.objects.filter(
-                Q(name__icontains=query)
-                | Q(email__icontains=query)
-                | Q(phone__icontains=query)
-                | Q(address__icontains=query),
-                company=company_id
-            ).distinct()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+
+        results = await sync_to_async(search)(company_id, query, offset=(page - 1) * SEARCH_PAGE_SIZE, limit=SEARCH_PAGE_SIZE + 1)
+        has_next = len(results) > SEARCH_PAGE_SIZE
+        results = results[:SEARCH_PAGE_SIZE]
+
+        found = {kind: [] for kind in SEARCH_MODELS}
+        for kind, object_id in results:
+            found[kind].append(object_id)
+
+        def ranked(queryset, kind):
+            def fetch():
+                objects = queryset.for_company(company_id).in_bulk(found[kind])
+                return [objects[object_id] for object_id in found[kind] if object_id in objects]
+            return fetch
+
+        products, categories, customers, leads = await gather_queries(
+            ranked(Product.objects.select_related('category'), 'product'),
+            ranked(Category.objects.all(), 'category'),
+            ranked(Customer.objects.all(), 'customer'),
+            ranked(Lead.objects.all(), 'lead'))
 
         context = {
             'query': query,
             'products': products,
             'categories': categories,
             'customers': customers,
+            'leads': leads,
+            'page': page,
+            'has_next': has_next,
             'role': role
         }
-        return render(request, 'search_result.html', context)
\ No newline at end of file
+        return await sync_to_async(render)(request, 'search_result.html', context)
+
+
+class AutocompleteView(View):
+    def get(self, request):
+        company_id = get_user_company(request)
+        query = request.GET.get('q', '').strip()
+        kind = request.GET.get('type')
+
+        if not company_id or not query or kind not in (None, 'product', 'customer'):
+            return JsonResponse({'results': []})
+
+        return JsonResponse({'results': autocomplete(company_id, query, kind)})
+
+
+class ProfileList(View):
+    def get(self, request):
+        company_id = get_user_company(request)
+        role = get_user_role(request, company_id)
+        if role != 'Admin':
+            messages.error(request, "Access denied.")
+            return redirect('core:dashboard')
+
+        path = request.GET.get('path', '').strip()
+        if path:
+            if path.startswith('/') and url_has_allowed_host_and_scheme(path, allowed_hosts={request.get_host()}):
+                separator = '&' if '?' in path else '?'
+                return redirect(path + separator + urlencode({PROFILE_PARAM: make_profile_token(request.user)}))
+            messages.error(request, "Enter a path on this site, like /core/dashboard/.")
+
+        profiles = paginate(request, RequestProfile.objects.for_company(company_id).select_related('user'))
+        return render(request, 'profile_list.html', {'profiles': profiles, 'role': role})
+
+
+class JobList(View):
+    def get(self, request):
+        company_id = get_user_company(request)
+        role = get_user_role(request, company_id)
+        if role != 'Admin':
+            messages.error(request, "Access denied.")
+            return redirect('core:dashboard')
+
+        jobs = Job.objects.for_company(company_id)
+        counts = dict(jobs.order_by().values_list('status').annotate(count=Count('id')))
+        status = request.GET.get('status', '')
+        if status in dict(JOB_STATUS):
+            jobs = jobs.filter(status=status)
+        context = {
+            'jobs': paginate(request, jobs),
+            'counts': [(value, label, counts.get(value, 0)) for value, label in JOB_STATUS],
+            'status': status,
+            'query': urlencode({'status': status}) if status else '',
+            'role': role,
+        }
+        return render(request, 'job_list.html', context)
+
+
+class ProfileDownload(View):
+    def get(self, request, pk, kind):
+        company_id = get_user_company(request)
+        role = get_user_role(request, company_id)
+        if role != 'Admin':
+            messages.error(request, "Access denied.")
+            return redirect('core:dashboard')
+
+        profile = get_object_or_404(RequestProfile.objects.for_company(company_id), pk=pk)
+        if kind not in ('stats', 'report'):
+            raise Http404("No such profile artifact.")
+        artifact = getattr(profile, kind)
+        return FileResponse(artifact.open('rb'), as_attachment=True, filename=os.path.basename(artifact.name))
+
+
+class MetricsView(View):
+    def get(self, request):
+        allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        if not allowed and settings.METRICS_TOKEN:
+            allowed = constant_time_compare(request.headers.get('Authorization', ''), 'Bearer ' + settings.METRICS_TOKEN)
+        if not allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ContentMediaView(View):
+    def get(self, request, path):
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
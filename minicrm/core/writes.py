@@ -0,0 +1,88 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.transaction import atomic
+
+
+class WriteQueue:
+    # SQLite lets one writer in at a time and leaves the rest retrying with
+    # growing sleeps, so under load some writes wait far longer than others.
+    # Threads of a worker queue here in arrival order and only the head of the
+    # queue takes the lock file shared with the other workers
+    def __init__(self, path):
+        self.path = path
+        self.condition = threading.Condition()
+        self.next_ticket = 0
+        self.serving = 0
+        self.owner = None
+        self.depth = 0
+        self.fd = None
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self.condition:
+            if self.owner == me:
+                self.depth += 1
+                return
+            ticket = self.next_ticket
+            self.next_ticket += 1
+            while self.serving != ticket:
+                self.condition.wait()
+            self.owner = me
+            self.depth = 1
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except OSError:
+            self.release()
+            raise
+
+    def release(self):
+        with self.condition:
+            self.depth -= 1
+            if self.depth:
+                return
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            self.owner = None
+            self.serving += 1
+            self.condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if not settings.SQLITE_WRITE_QUEUE or connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    with _queues_lock:
+        if using not in _queues:
+            _queues[using] = WriteQueue('%s-writelock' % connection.settings_dict['NAME'])
+        return _queues[using]
+
+
+@contextmanager
+def serialized_write(using=DEFAULT_DB_ALIAS):
+    queue = write_queue(using)
+    if queue is None:
+        yield
+        return
+    queue.acquire()
+    try:
+        yield
+    finally:
+        queue.release()
+
+
+@contextmanager
+def write_atomic(using=DEFAULT_DB_ALIAS):
+    # for short write transactions; the queue is taken before BEGIN so a
+    # transaction never holds SQLite's lock while waiting for its turn
+    with serialized_write(using), atomic(using=using):
+        yield
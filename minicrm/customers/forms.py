@@ -1,5 +1,6 @@
 from django import forms
-from customers.models import Customer,Lead
+from django.contrib.auth.models import User
+from customers.models import Customer, Lead, STATUS
 
 class LeadForm(forms.ModelForm):
     class Meta:
@@ -10,3 +11,28 @@ class CustomerForm(forms.ModelForm):
     class Meta:
         model=Customer
         fields=['name','email','phone','address']
+
+BULK_ACTIONS = (
+    ('assign', 'Reassign'),
+    ('status', 'Change status'),
+    ('convert', 'Convert to customers'),
+    ('delete', 'Delete'),
+)
+
+class LeadBulkForm(forms.Form):
+    action = forms.ChoiceField(choices=BULK_ACTIONS)
+    leads = forms.ModelMultipleChoiceField(queryset=Lead.objects.none(), required=False)
+    select_all = forms.BooleanField(required=False)
+    filter_status = forms.ChoiceField(choices=[('', 'All')] + STATUS, required=False)
+    assigned_to = forms.ModelChoiceField(queryset=User.objects.none(), required=False)
+    status = forms.ChoiceField(choices=[('', '---------')] + STATUS, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('select_all') and not cleaned_data.get('leads'):
+            raise forms.ValidationError("Select at least one lead.")
+        if cleaned_data.get('action') == 'assign' and not cleaned_data.get('assigned_to'):
+            raise forms.ValidationError("Choose who the leads go to.")
+        if cleaned_data.get('action') == 'status' and not cleaned_data.get('status'):
+            raise forms.ValidationError("Choose the new status.")
+        return cleaned_data
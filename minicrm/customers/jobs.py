@@ -0,0 +1,8 @@
+from core.jobs import job
+from customers.models import Lead
+from customers.utils import convert_leads
+
+
+@job(priority=5)
+def convert_lead(company_id, lead_id, user_id=None):
+    convert_leads(company_id, Lead.objects.for_company(company_id).filter(id=lead_id, status='Converted'), user_id)
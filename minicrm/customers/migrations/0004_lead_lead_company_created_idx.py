@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('customers', '0003_alter_lead_address'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['company', '-created_at', '-id'], name='lead_company_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('customers', '0004_lead_lead_company_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['company', 'email'], name='customer_company_email_idx'),
+        ),
+    ]
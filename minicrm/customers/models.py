@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from accounts.models import Company
+from accounts.models import Company, CompanyQuerySet
 
 STATUS = [
     ('New', 'New'),
@@ -16,8 +16,17 @@ class Customer(models.Model):
     address = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
 
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'email'], name='customer_company_email_idx'),
+            models.Index(fields=['company', 'updated_at'], name='customer_company_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -33,6 +42,13 @@ class Lead(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     address = models.TextField()
 
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', '-created_at', '-id'], name='lead_company_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -1,3 +1,106 @@
+from unittest import skipUnless
+from unittest.mock import patch
 from django.test import TestCase
+from django.db import connection
+from django.contrib.auth.models import User
+from accounts.models import CompanyUser
+from core.jobs import run_pending_jobs
+from core.models import Job, SearchDocument
+from core.testing import CompanyTestMixin, QueryPlanMixin
+from customers.models import Customer, Lead
+from customers.utils import convert_leads, existing_customer_emails
 
-# Create your tests here.
+
+class LeadBulkActionTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.seller = User.objects.create_user('seller', 'seller@example.com', 'password')
+        CompanyUser.objects.create(user=self.seller, company=self.company, role='Staff', status='Approved')
+        Customer.objects.create(name='Old', email='old@example.com', phone='1', address='Street', company=self.company)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leads = [
+                Lead.objects.create(name=name, email=email, address='Street', company=self.company)
+                for name, email in [('Ann', 'ann@example.com'), ('Old', 'old@example.com'),
+                                    ('Ann again', 'ann@example.com'), ('Nobody', None)]]
+
+    def bulk(self, action, leads=None, **data):
+        data.update(action=action, leads=[lead.id for lead in leads or self.leads])
+        return self.client.post('/customers/leadbulk/', data)
+
+    def test_convert_checks_duplicates_in_one_query(self):
+        with self.assertNumQueries(1):
+            existing = existing_customer_emails(self.company.id, ['ann@example.com', 'old@example.com'])
+        self.assertEqual(existing, {'old@example.com'})
+
+        response = self.bulk('convert')
+        self.assertEqual(sorted(Customer.objects.values_list('email', flat=True)), ['ann@example.com', 'old@example.com'])
+        self.assertEqual(Lead.objects.filter(status='Converted').count(), 3)
+        self.assertEqual(Lead.objects.get(name='Nobody').status, 'New')
+        self.assertIn('1 lead(s) without an email were not converted.',
+                      [str(message) for message in response.wsgi_request._messages])
+        self.assertTrue(SearchDocument.objects.filter(kind='customer', title='Ann').exists())
+
+    def test_suggestions_wait_for_the_commit(self):
+        with patch('customers.utils.update_customer') as update, \
+                self.captureOnCommitCallbacks(execute=False) as callbacks:
+            convert_leads(self.company.id, self.leads)
+        update.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.assertEqual([call.args[0].name for call in update.call_args_list], ['Ann'])
+
+    def test_reassign_status_and_select_all(self):
+        response = self.client.get('/customers/leadlist/?status=New')
+        self.assertContains(response, 'name="leads" value="%d"' % self.leads[0].id)
+        self.assertContains(response, '<option value="%d">seller</option>' % self.seller.id)
+
+        self.bulk('assign', assigned_to=self.seller.id)
+        self.assertEqual(Lead.objects.filter(assigned_to=self.seller).count(), 4)
+
+        self.bulk('status', leads=self.leads[:2], status='Contacted')
+        self.client.post('/customers/leadbulk/', {'action': 'status', 'status': 'NotConverted',
+                                                  'select_all': 'on', 'filter_status': 'Contacted'})
+        self.assertEqual(Lead.objects.filter(status='NotConverted').count(), 2)
+        self.assertEqual(Lead.objects.filter(status='New').count(), 2)
+
+    def test_only_admins_delete(self):
+        self.membership.role = 'Manager'
+        self.membership.save()
+        self.bulk('delete')
+        self.assertEqual(Lead.objects.count(), 4)
+
+        self.membership.role = 'Admin'
+        self.membership.save()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.bulk('delete', leads=self.leads[:3])
+        self.assertEqual(list(Lead.objects.values_list('name', flat=True)), ['Nobody'])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(SearchDocument.objects.filter(kind='lead').values_list('title', flat=True)), ['Nobody'])
+
+    def test_bulk_controls_only_for_managers(self):
+        self.assertContains(self.client.get('/customers/leadlist/'), 'name="leads"')
+        self.membership.role = 'Staff'
+        self.membership.save()
+        self.assertNotContains(self.client.get('/customers/leadlist/'), 'name="leads"')
+
+
+class LeadUpdateTest(CompanyTestMixin, TestCase):
+    def test_lead_conversion_runs_in_background(self):
+        lead = Lead.objects.create(name='Jane', email='jane@example.com', phone='1', address='Street',
+                                   company=self.company)
+        data = {'name': 'Jane', 'email': 'jane@example.com', 'phone': '1', 'status': 'Converted', 'address': 'Street'}
+        self.client.post('/customers/leadupdate/%d/' % lead.id, data)
+        self.client.post('/customers/leadupdate/%d/' % lead.id, data)
+        self.assertFalse(Customer.objects.exists())
+        self.assertEqual(Job.objects.filter(status='Queued').count(), 1)
+
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(Customer.objects.get().email, 'jane@example.com')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTest(CompanyTestMixin, QueryPlanMixin, TestCase):
+    def test_lead_list(self):
+        self.assertUsesIndex(
+            Lead.objects.for_company(self.company.id).order_by('-created_at', '-id')[:31],
+            'lead_company_created_idx')
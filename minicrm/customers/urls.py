@@ -24,6 +24,7 @@ urlpatterns = [
 
     path('leadadd/', views.LeadAdd.as_view(), name='lead_add'),
     path('leadlist/', views.LeadList.as_view(), name='lead_list'),
+    path('leadbulk/', views.LeadBulkAction.as_view(), name='lead_bulk'),
     path('leadupdate/<int:i>/', views.LeadUpdate.as_view(), name='lead_update'),
     path('leaddelete/<int:i>/', views.LeadDelete.as_view(), name='lead_delete'),
     path('customerlist/', views.CustomerList.as_view(), name='customer_list'),
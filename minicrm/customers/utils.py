@@ -0,0 +1,51 @@
+from functools import partial
+from django.db.transaction import on_commit
+from accounts.utils import bump_company_version
+from core.autocomplete import update_customer
+from core.search import index_objects
+from core.writes import write_atomic
+from customers.models import Customer
+
+# emails looked up per query, under SQLite's bound parameter limit
+EMAIL_BATCH_SIZE = 500
+
+
+def existing_customer_emails(company_id, emails):
+    emails = list(emails)
+    existing = set()
+    for start in range(0, len(emails), EMAIL_BATCH_SIZE):
+        existing.update(Customer.objects.for_company(company_id).filter(
+            email__in=emails[start:start + EMAIL_BATCH_SIZE]).values_list('email', flat=True))
+    return existing
+
+
+def convert_leads(company_id, leads, user_id=None):
+    # leads whose email is already a customer's (or came earlier in the batch)
+    # are skipped, and leads without an email can't become customers.
+    # bulk_create doesn't send post_save, so the search index, suggestions and
+    # dashboard version are updated here
+    leads = [lead for lead in leads if lead.email]
+    seen = existing_customer_emails(company_id, {lead.email for lead in leads})
+    customers = []
+    for lead in leads:
+        if lead.email in seen:
+            continue
+        seen.add(lead.email)
+        customers.append(Customer(
+            name=lead.name,
+            email=lead.email,
+            phone=lead.phone or '',
+            address=lead.address,
+            created_by_id=user_id,
+            company_id=company_id,
+        ))
+    if not customers:
+        return []
+
+    with write_atomic():
+        customers = Customer.objects.bulk_create(customers, batch_size=EMAIL_BATCH_SIZE)
+        index_objects('customer', customers)
+        bump_company_version(company_id)
+        for customer in customers:
+            on_commit(partial(update_customer, customer))
+    return customers
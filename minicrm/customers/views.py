@@ -1,10 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views import View
 from django.contrib import messages
 from accounts.utils import get_user_company, get_user_role
-from customers.models import Lead, Customer
-from customers.forms import LeadForm, CustomerForm
+from core.jobs import enqueue
+from core.pagination import paginate
+from core.search import unindex_batch
+from core.writes import write_atomic
+from customers.jobs import convert_lead
+from customers.models import Lead, Customer, STATUS
+from customers.forms import LeadForm, CustomerForm, LeadBulkForm
+from customers.utils import convert_leads
 from django.contrib.auth.models import User
+from urllib.parse import urlencode
+
+
+def assignable_users(company_id):
+    return User.objects.filter(
+        is_superuser=False,
+        companyuser__company_id=company_id,
+        companyuser__status='Approved')
 
 
 class LeadAdd(View):
@@ -54,15 +69,87 @@ class LeadAdd(View):
 
 
 class LeadList(View):
+    replica_reads = True
+
     def get(self, request):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        leads = Lead.objects.filter(company_id=company_id).order_by('-created_at')
-        context = {'leads': leads, 'role': role}
+        leads = Lead.objects.for_company(company_id)
+        status = request.GET.get('status', '')
+        if status in dict(STATUS):
+            leads = leads.filter(status=status)
+        context = {
+            'leads': paginate(request, leads, ('-created_at', '-id')),
+            'role': role,
+            'status': status,
+            'statuses': STATUS,
+            'query': urlencode({'status': status}) if status else '',
+            'can_manage': role in ['Admin', 'Manager'],
+        }
+        if context['can_manage']:
+            context['users'] = assignable_users(company_id)
         return render(request, 'lead_list.html', context)
 
 
+class LeadBulkAction(View):
+    def post(self, request):
+        company_id = get_user_company(request)
+        role = get_user_role(request, company_id)
+
+        if role not in ['Admin', 'Manager']:
+            messages.error(request, "You don't have permission to update leads.")
+            return redirect('customers:lead_list')
+
+        form = LeadBulkForm(request.POST)
+        form.fields['leads'].queryset = Lead.objects.for_company(company_id)
+        form.fields['assigned_to'].queryset = assignable_users(company_id)
+        if not form.is_valid():
+            for errors in form.errors.values():
+                messages.error(request, errors[0])
+            return redirect('customers:lead_list')
+
+        data = form.cleaned_data
+        leads = Lead.objects.for_company(company_id)
+        if data['select_all']:
+            if data['filter_status']:
+                leads = leads.filter(status=data['filter_status'])
+        else:
+            leads = data['leads']
+
+        action = data['action']
+        if action == 'status' and data['status'] == 'Converted':
+            action = 'convert'
+
+        if action == 'assign':
+            count = leads.update(assigned_to=data['assigned_to'])
+            messages.success(request, '%d lead(s) assigned to %s.' % (count, data['assigned_to'].username))
+        elif action == 'status':
+            count = leads.update(status=data['status'])
+            messages.success(request, '%d lead(s) marked %s.' % (count, data['status']))
+        elif action == 'convert':
+            # leads without an email can't become customers and keep their status
+            convertible = leads.exclude(email__isnull=True).exclude(email='')
+            skipped = leads.count() - convertible.count()
+            with write_atomic():
+                customers = convert_leads(company_id, convertible.only('name', 'email', 'phone', 'address'),
+                                          request.user.id)
+                count = convertible.update(status='Converted')
+            messages.success(request, '%d lead(s) converted, %d new customer(s).' % (count, len(customers)))
+            if skipped:
+                messages.warning(request, '%d lead(s) without an email were not converted.' % skipped)
+        elif role == 'Admin':
+            with write_atomic(), unindex_batch():
+                deleted = leads.delete()[1]
+            messages.success(request, '%d lead(s) deleted.' % deleted.get('customers.Lead', 0))
+        else:
+            messages.error(request, "You don't have permission to delete leads.")
+
+        if data['filter_status']:
+            return redirect('%s?%s' % (reverse('customers:lead_list'), urlencode({'status': data['filter_status']})))
+        return redirect('customers:lead_list')
+
+
 
 class LeadUpdate(View):
     def get(self, request, i):
@@ -73,7 +160,7 @@ class LeadUpdate(View):
             messages.error(request, "You don't have permission to update leads.")
             return redirect('customers:lead_list')
 
-        lead = get_object_or_404(Lead, id=i, company_id=company_id)
+        lead = get_object_or_404(Lead.objects.for_company(company_id), id=i)
         form = LeadForm(instance=lead)
         context = {'form': form, 'lead': lead}
         return render(request, 'lead_update.html', context)
@@ -86,24 +173,14 @@ class LeadUpdate(View):
             messages.error(request, "You don't have permission to update leads.")
             return redirect('customers:lead_list')
 
-        lead = get_object_or_404(Lead, id=i, company_id=company_id)
+        lead = get_object_or_404(Lead.objects.for_company(company_id), id=i)
         form = LeadForm(request.POST, instance=lead)
 
         if form.is_valid():
             lead = form.save()
             if lead.status == 'Converted':
-                existing_customer = Customer.objects.filter(
-                    email=lead.email, company_id=company_id).first()
-
-                if not existing_customer:
-                    Customer.objects.create(
-                        name=lead.name,
-                        email=lead.email,
-                        phone=lead.phone,
-                        address=lead.address,
-                        created_by=request.user,
-                        company_id=company_id,
-                    )
+                enqueue(convert_lead, company_id=company_id, dedupe_key='convert_lead:%d' % lead.id,
+                        lead_id=lead.id, user_id=request.user.id)
 
             messages.success(request, 'Lead updated successfully.')
             return redirect('customers:lead_list')
@@ -117,7 +194,7 @@ class LeadDelete(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
         if role == 'Admin':
-            lead = get_object_or_404(Lead, id=i, company_id=company_id)
+            lead = get_object_or_404(Lead.objects.for_company(company_id), id=i)
             lead.delete()
             messages.success(request, 'Lead deleted successfully')
         else:
@@ -126,12 +203,14 @@ class LeadDelete(View):
 
 
 class CustomerList(View):
+    replica_reads = True
+
     def get(self, request):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
 
-        customers = Customer.objects.filter(company_id=company_id).order_by('-id')
+        customers = paginate(request, Customer.objects.for_company(company_id))
 
         context = {'customers': customers, 'role': role}
         return render(request, 'customer_list.html', context)
@@ -164,7 +243,7 @@ class CustomerUpdate(View):
     def get(self, request, i):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
-        customer = get_object_or_404(Customer, id=i, company_id=company_id)
+        customer = get_object_or_404(Customer.objects.for_company(company_id), id=i)
 
         if role in ['Admin', 'Manager']:
             form_instance = CustomerForm(instance=customer)
@@ -177,7 +256,7 @@ class CustomerUpdate(View):
     def post(self, request, i):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
-        customer = get_object_or_404(Customer, id=i, company_id=company_id)
+        customer = get_object_or_404(Customer.objects.for_company(company_id), id=i)
 
         if role in ['Admin', 'Manager']:
             form_instance = CustomerForm(request.POST, instance=customer)
@@ -198,7 +277,7 @@ class CustomerDelete(View):
         role = get_user_role(request, company_id)
 
         if role == 'Admin':
-            customer = get_object_or_404(Customer, id=i, company_id=company_id)
+            customer = get_object_or_404(Customer.objects.for_company(company_id), id=i)
             customer.delete()
             messages.success(request, 'Customer deleted successfully')
         else:
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from inventory.models import Category,Product
+from inventory.models import Category,Product,StockMovement
 
 admin.site.register(Category)
 admin.site.register(Product)
+admin.site.register(StockMovement)
 
 
 
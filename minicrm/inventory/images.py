@@ -0,0 +1,72 @@
+import io
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.core.files.base import ContentFile
+
+# longest edge in pixels; each size is stored as WebP and as JPEG for browsers
+# without WebP support
+VARIANTS = {
+    'thumb': 160,
+    'list': 480,
+    'detail': 1000,
+}
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+VARIANT_DIR = 'variants'
+
+# names already known to exist, so rendering a list doesn't stat every file
+_known = set()
+
+
+def variant_name(name, size, extension):
+    return '%s/%s/%s.%s' % (VARIANT_DIR, size, os.path.splitext(name)[0], extension)
+
+
+def generate_variants(storage, original_name):
+    try:
+        with storage.open(original_name, 'rb') as f:
+            original = ImageOps.exif_transpose(Image.open(f))
+            original.load()
+    except (OSError, UnidentifiedImageError):
+        return False
+
+    for size, edge in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        for extension, image_format in FORMATS:
+            converted = image
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                converted = Image.new('RGB', image.size, 'white')
+                converted.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            elif image_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+                converted = image.convert('RGBA')
+            output = io.BytesIO()
+            converted.save(output, image_format, quality=80)
+            name = variant_name(original_name, size, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(output.getvalue()))
+            _known.add(name)
+    return True
+
+
+def variants_ready(field_file):
+    names = [variant_name(field_file.name, size, extension) for size in VARIANTS for extension, image_format in FORMATS]
+    if all(name in _known for name in names):
+        return True
+    if all(field_file.storage.exists(name) for name in names):
+        _known.update(names)
+        return True
+    return False
+
+
+def variant_url(field_file, size, extension='jpg'):
+    return field_file.storage.url(variant_name(field_file.name, size, extension))
+
+
+def delete_variants(storage, name):
+    for size in VARIANTS:
+        for extension, image_format in FORMATS:
+            variant = variant_name(name, size, extension)
+            _known.discard(variant)
+            if storage.exists(variant):
+                storage.delete(variant)
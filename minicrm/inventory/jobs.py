@@ -0,0 +1,26 @@
+from django.core.files.storage import default_storage
+from core.jobs import enqueue, job
+from inventory.images import generate_variants, variants_ready
+from inventory.models import Category, Product
+
+
+@job(max_attempts=2)
+def generate_image_variants(name):
+    if default_storage.exists(name):
+        generate_variants(default_storage, name)
+
+
+def queue_variants(name):
+    enqueue(generate_image_variants, dedupe_key='variants:%s' % name, name=name)
+
+
+def queue_missing_variants():
+    # variants are made in the background on upload; media from before that is
+    # queued by the generate_variants command
+    queued = set()
+    for model in (Product, Category):
+        for instance in model.objects.exclude(image='').only('image').iterator():
+            if instance.image.name not in queued and not variants_ready(instance.image):
+                queue_variants(instance.image.name)
+                queued.add(instance.image.name)
+    return len(queued)
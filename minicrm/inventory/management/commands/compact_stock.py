@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from inventory.utils import compact_stock_movements
+
+
+class Command(BaseCommand):
+    help = "Fold pending stock movements into the Product.stock snapshot"
+
+    def handle(self, *args, **options):
+        count = compact_stock_movements()
+        self.stdout.write(self.style.SUCCESS("Compacted %d stock movements." % count))
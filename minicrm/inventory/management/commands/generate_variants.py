@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from inventory.jobs import queue_missing_variants
+
+
+class Command(BaseCommand):
+    help = "Queue resized variants for product and category images that don't have them yet"
+
+    def handle(self, *args, **options):
+        count = queue_missing_variants()
+        self.stdout.write(self.style.SUCCESS("Queued variants for %d images." % count))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('inventory', '0002_stockmovement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock', 0)), fields=['company'], name='product_out_of_stock_idx'),
+        ),
+    ]
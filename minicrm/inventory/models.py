@@ -1,22 +1,49 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from accounts.models import Company
+from accounts.models import Company, CompanyQuerySet
 
 SOURCE_CHOICES = (
     ('Bought', 'Bought'),
     ('Manufactured', 'Manufactured'),
 )
 
+MOVEMENT_REASONS = (
+    ('Order', 'Order'),
+    ('OrderUpdate', 'OrderUpdate'),
+    ('OrderDelete', 'OrderDelete'),
+    ('Increase', 'Increase'),
+    ('Decrease', 'Decrease'),
+    ('Adjustment', 'Adjustment'),
+)
+
 class Category(models.Model):
     name = models.CharField(max_length=120, unique=True)
     image = models.ImageField(upload_to='category/', default='default_category.jpg')
     created_at = models.DateTimeField(auto_now_add=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
 
+    objects = CompanyQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
 
+class ProductQuerySet(CompanyQuerySet):
+    def with_stock(self):
+        pending = (StockMovement.objects.filter(product=models.OuterRef('pk'), compacted=False)
+                   .values('product').annotate(total=models.Sum('delta')).values('total'))
+        return self.annotate(pending_stock=Coalesce(models.Subquery(pending), 0))
+
+    def out_of_stock(self):
+        # a union rather than an OR so stock=0 can use the partial index; a product
+        # with stock left can only be out through uncompacted movements
+        candidates = self.filter(stock=0).values('pk').union(
+            self.filter(movements__compacted=False).values('pk'))
+        return self.model.objects.filter(pk__in=candidates).with_stock().alias(
+            current_stock=models.F('stock') + models.F('pending_stock')).filter(current_stock__lte=0)
+
+
 class Product(models.Model):
     name = models.CharField(max_length=100)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -31,11 +58,45 @@ class Product(models.Model):
     image = models.ImageField(upload_to='product/', default='default_product.jpg')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company'], condition=models.Q(stock=0), name='product_out_of_stock_idx'),
+            models.Index(fields=['company', 'updated_at'], name='product_company_updated_idx'),
+        ]
+
+    @property
+    def current_stock(self):
+        # stock is the last compacted snapshot; movements since then are added on top
+        if not hasattr(self, 'pending_stock'):
+            self.pending_stock = self.movements.filter(compacted=False).aggregate(
+                total=models.Sum('delta'))['total'] or 0
+        return self.stock + self.pending_stock
+
     @property
     def out_of_stock(self):
-        return self.stock <= 0
+        return self.current_stock <= 0
 
     def __str__(self):
         return self.name
+
+
+class StockMovement(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=MOVEMENT_REASONS)
+    order = models.ForeignKey('transaction.Order', on_delete=models.SET_NULL, null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    compacted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['product', 'compacted'])]
+
+    def __str__(self):
+        return "%s %+d" % (self.product.name, self.delta)
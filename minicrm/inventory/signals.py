@@ -0,0 +1,29 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from core.media import add_reference, release_reference
+from inventory.jobs import queue_variants
+from inventory.models import Category, Product
+
+
+@receiver(post_init, sender=Product)
+@receiver(post_init, sender=Category)
+def remember_image(sender, instance, **kwargs):
+    instance._image_name = str(instance.__dict__.get('image') or '')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def track_image(sender, instance, **kwargs):
+    if instance.image.name == instance._image_name:
+        return
+    add_reference(instance.image.name)
+    release_reference(instance._image_name)
+    if instance.image:
+        queue_variants(instance.image.name)
+    instance._image_name = instance.image.name
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def release_image(sender, instance, **kwargs):
+    release_reference(instance._image_name)
@@ -0,0 +1,40 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from inventory.images import VARIANTS, variant_url, variants_ready
+
+register = template.Library()
+
+DISPLAY_SIZES = {
+    'thumb': '80px',
+    'list': '(max-width: 576px) 50vw, 240px',
+    'detail': '(max-width: 768px) 100vw, 500px',
+}
+
+
+def srcset(field_file, extension):
+    return ', '.join('%s %dw' % (variant_url(field_file, size, extension), edge) for size, edge in VARIANTS.items())
+
+
+@register.simple_tag
+def picture(field_file, size, **attrs):
+    if not field_file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    # until the variants exist the original is shown as it is
+    if not variants_ready(field_file):
+        return format_html('<img src="{}"{}>', field_file.url, flatatt(attrs))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset(field_file, 'webp'), DISPLAY_SIZES[size], variant_url(field_file, size),
+        srcset(field_file, 'jpg'), DISPLAY_SIZES[size], flatatt(attrs))
+
+
+@register.filter
+def variant(field_file, size):
+    if not field_file:
+        return ''
+    if variants_ready(field_file):
+        return variant_url(field_file, size)
+    return field_file.url
@@ -1,3 +1,150 @@
-from django.test import TestCase
+import io
+import tempfile
+from unittest import skipUnless
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.db import connection
+from django.template import Template, Context
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from inventory.models import Category, Product, StockMovement
+from inventory.utils import InsufficientStock, compact_stock_movements, record_stock_movements, set_stock
+from inventory.images import variant_name
+from core.jobs import run_pending_jobs
+from core.models import Job
+from core.testing import CompanyTestMixin, QueryPlanMixin
 
-# Create your tests here.
+
+def upload(name, size=(1600, 1200)):
+    output = io.BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 128)).save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageVariantTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Cases', company=self.company, image=upload('cases.png'))
+        self.product = Product.objects.create(
+            name='Case', category=self.category, source='Bought', selling_price=10, company=self.company,
+            image=upload('case.png'))
+        run_pending_jobs()
+
+    def test_variants_made_on_upload(self):
+        for field_file in (self.category.image, self.product.image):
+            for size, edge in (('thumb', 160), ('detail', 1000)):
+                for extension in ('webp', 'jpg'):
+                    name = variant_name(field_file.name, size, extension)
+                    with default_storage.open(name) as f:
+                        self.assertEqual(max(Image.open(f).size), edge)
+
+    def test_picture_tag(self):
+        html = Template("{% load images %}{% picture product.image 'thumb' alt='Case' %}").render(
+            Context({'product': self.product}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(' 160w, ', html)
+
+    def test_existing_media_queued_by_command(self):
+        name = default_storage.save('product/old.png', upload('old.png', size=(800, 600)))
+        Product.objects.filter(pk=self.product.pk).update(image=name)
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertFalse(default_storage.exists(variant_name(name, 'list', 'webp')))
+
+        html = Template("{% load images %}{% picture product.image 'list' %}").render(Context({'product': product}))
+        self.assertNotIn('<picture>', html)
+        self.assertFalse(Job.objects.filter(status='Queued').exists())
+        call_command('generate_variants', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(status='Queued').count(), 1)
+        run_pending_jobs()
+        self.assertTrue(default_storage.exists(variant_name(name, 'list', 'webp')))
+
+
+class StockLedgerTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Cases', company=self.company)
+        self.case, self.cover = Product.objects.bulk_create([
+            Product(name=name, category=category, source='Bought', selling_price=10, stock=5, company=self.company)
+            for name in ('Case', 'Cover')])
+
+    def stock(self):
+        return {product.id: product.current_stock for product in Product.objects.with_stock()}
+
+    def test_movements_add_to_the_snapshot(self):
+        record_stock_movements(self.company.id, {self.case.id: -2, self.cover.id: 3}, 'Order')
+        record_stock_movements(self.company.id, {self.case.id: 1, self.cover.id: 0}, 'Increase')
+        self.assertEqual(StockMovement.objects.count(), 3)
+        self.assertEqual(self.stock(), {self.case.id: 4, self.cover.id: 8})
+        self.assertEqual(Product.objects.get(pk=self.case.pk).current_stock, 4)
+
+    def test_decrease_below_zero_records_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            record_stock_movements(self.company.id, {self.case.id: -6, self.cover.id: 1}, 'Order')
+        self.assertFalse(StockMovement.objects.exists())
+
+        record_stock_movements(self.company.id, {self.case.id: -5}, 'Order')
+        with self.assertRaises(InsufficientStock):
+            record_stock_movements(self.company.id, {self.case.id: -1}, 'Decrease')
+        self.assertEqual(self.stock()[self.case.id], 0)
+
+    def test_set_stock_counts_pending_movements(self):
+        record_stock_movements(self.company.id, {self.case.id: -3}, 'Order')
+        set_stock(self.company.id, self.case.id, 10, user=self.user)
+        self.assertEqual(StockMovement.objects.get(reason='Adjustment').delta, 8)
+        self.assertEqual(self.stock()[self.case.id], 10)
+
+    def test_decrease_view_stops_at_zero(self):
+        for x in range(7):
+            self.client.get('/inventory/%d/stock/decrease/' % self.case.id)
+        self.assertEqual(self.stock()[self.case.id], 0)
+
+    def test_product_edit_leaves_the_snapshot_to_compaction(self):
+        record_stock_movements(self.company.id, {self.case.id: -1}, 'Order')
+        self.client.post('/inventory/products-edit/%d' % self.case.id, {
+            'name': 'Phone case', 'source': 'Bought', 'category': self.case.category_id,
+            'selling_price': 12, 'min_selling_price': 0, 'stock': 9})
+        case = Product.objects.get(pk=self.case.pk)
+        self.assertEqual((case.name, case.stock, case.current_stock), ('Phone case', 5, 9))
+
+    def test_compaction_folds_movements_into_stock(self):
+        record_stock_movements(self.company.id, {self.case.id: -2, self.cover.id: 4}, 'Order')
+        self.assertEqual(compact_stock_movements(), 2)
+        self.assertEqual(dict(Product.objects.values_list('id', 'stock')), {self.case.id: 3, self.cover.id: 9})
+        self.assertEqual(self.stock(), {self.case.id: 3, self.cover.id: 9})
+        self.assertEqual(compact_stock_movements(), 0)
+
+    def test_compaction_leaves_negative_totals_pending(self):
+        StockMovement.objects.bulk_create([
+            StockMovement(company=self.company, product=self.case, delta=-7, reason='Order'),
+            StockMovement(company=self.company, product=self.cover, delta=2, reason='Order')])
+        with self.assertLogs('inventory.utils', 'WARNING'):
+            self.assertEqual(compact_stock_movements(), 1)
+        self.assertEqual(dict(Product.objects.values_list('id', 'stock')), {self.case.id: 5, self.cover.id: 7})
+        self.assertTrue(StockMovement.objects.filter(product=self.case, compacted=False).exists())
+
+
+class OutOfStockTest(CompanyTestMixin, TestCase):
+    def test_counts_pending_movements(self):
+        category = Category.objects.create(name='Cases', company=self.company)
+
+        def product(stock):
+            return Product.objects.create(
+                name='Case', category=category, source='Bought', selling_price=10, stock=stock, company=self.company)
+
+        empty, drained, restocked = product(0), product(5), product(0)
+        product(5)
+        record_stock_movements(self.company.id, {drained.id: -5, restocked.id: 3}, 'Adjustment')
+
+        self.assertEqual(
+            set(Product.objects.for_company(self.company.id).out_of_stock().values_list('id', flat=True)),
+            {empty.id, drained.id})
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTest(CompanyTestMixin, QueryPlanMixin, TestCase):
+    def test_out_of_stock(self):
+        self.assertUsesIndex(
+            Product.objects.for_company(self.company.id).out_of_stock(), 'product_out_of_stock_idx')
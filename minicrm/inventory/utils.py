@@ -0,0 +1,88 @@
+import logging
+from collections import defaultdict
+from django.db.models import Case, When, F, Max, IntegerField
+from core.writes import write_atomic
+from accounts.utils import bump_company_version
+from inventory.models import Product, StockMovement
+
+logger = logging.getLogger(__name__)
+
+COMPACT_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def locked_stock(company_id, product_ids):
+    # current stock read inside the write transaction, so no other movement
+    # can land between reading it and recording against it. Only decreases and
+    # adjustments need this: two decreases checked against the same stock would
+    # both pass and oversell, so they have to queue per product. Restocks and
+    # plain increases never take the lock; they only append to the ledger.
+    product_ids = list(product_ids)
+    list(Product.objects.select_for_update().filter(id__in=product_ids).values_list('id', flat=True))
+    return {product.id: product.current_stock
+            for product in Product.objects.for_company(company_id).with_stock().filter(id__in=product_ids)}
+
+
+def record_stock_movements(company_id, deltas, reason, order=None, user=None):
+    # raises InsufficientStock, recording nothing, if a decrease would take a
+    # product below zero
+    with write_atomic():
+        decreases = {product_id: delta for product_id, delta in deltas.items() if delta < 0}
+        if decreases:
+            stock = locked_stock(company_id, decreases)
+            if any(stock.get(product_id, 0) + delta < 0 for product_id, delta in decreases.items()):
+                raise InsufficientStock()
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(company_id=company_id, product_id=product_id, delta=delta,
+                          reason=reason, order=order, user=user)
+            for product_id, delta in deltas.items() if delta])
+        if movements:
+            bump_company_version(company_id)
+
+
+def set_stock(company_id, product_id, stock, user=None):
+    with write_atomic():
+        current = locked_stock(company_id, [product_id])[product_id]
+        record_stock_movements(company_id, {product_id: stock - current}, 'Adjustment', user=user)
+
+
+def compact_stock_movements():
+    with write_atomic():
+        last_id = StockMovement.objects.filter(compacted=False).aggregate(last_id=Max('id'))['last_id']
+        if last_id is None:
+            return 0
+
+        # sum the rows themselves and mark exactly those ids, so a movement that
+        # commits between the two statements is left pending, not dropped
+        totals = defaultdict(int)
+        ids = defaultdict(list)
+        for movement_id, product_id, delta in StockMovement.objects.filter(
+                compacted=False, id__lte=last_id).values_list('id', 'product_id', 'delta'):
+            totals[product_id] += delta
+            ids[product_id].append(movement_id)
+
+        # a total that would take the snapshot below zero can't be folded in;
+        # those movements stay pending rather than failing every compaction
+        stock = dict(Product.objects.filter(id__in=totals).values_list('id', 'stock'))
+        negative = [product_id for product_id, total in totals.items() if stock.get(product_id, 0) + total < 0]
+        if negative:
+            logger.warning("Not compacting stock movements of products %s: stock would go below zero", negative)
+            for product_id in negative:
+                del totals[product_id], ids[product_id]
+
+        changed = {product_id: total for product_id, total in totals.items() if total}
+        if changed:
+            Product.objects.filter(id__in=changed).update(
+                stock=Case(
+                    *[When(id=product_id, then=F('stock') + total) for product_id, total in changed.items()],
+                    default=F('stock'),
+                    output_field=IntegerField()))
+
+        movement_ids = [movement_id for product_ids in ids.values() for movement_id in product_ids]
+        for start in range(0, len(movement_ids), COMPACT_BATCH_SIZE):
+            StockMovement.objects.filter(
+                id__in=movement_ids[start:start + COMPACT_BATCH_SIZE]).update(compacted=True)
+        return len(movement_ids)
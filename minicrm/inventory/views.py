@@ -1,9 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib import messages
+from core.writes import write_atomic
 from accounts.utils import get_user_company, get_user_role
+from core.pagination import paginate
 from inventory.models import Category, Product
 from inventory.forms import CategoryForm, ProductForm, StockForm
+from inventory.utils import InsufficientStock, record_stock_movements, set_stock
 
 
 #category
@@ -13,7 +16,7 @@ class CategoryList(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        categories = Category.objects.filter(company_id=company_id)
+        categories = Category.objects.for_company(company_id)
 
         return render(request, 'category_list.html', {
             'categories': categories,
@@ -44,7 +47,8 @@ class CategoryCreate(View):
         if form.is_valid():
             category = form.save(commit=False)
             category.company_id = company_id
-            category.save()
+            with write_atomic():
+                category.save()
 
             messages.success(request, "Category added successfully.")
             return redirect('inventory:category_list')
@@ -61,7 +65,7 @@ class CategoryUpdate(View):
             messages.error(request, "You don't have permission to edit categories.")
             return redirect('inventory:category_list')
 
-        category = get_object_or_404(Category, pk=pk, company_id=company_id)
+        category = get_object_or_404(Category.objects.for_company(company_id), pk=pk)
 
         form = CategoryForm(instance=category)
         return render(request, 'category_form.html', {'form': form, 'role': role})
@@ -74,13 +78,14 @@ class CategoryUpdate(View):
             messages.error(request, "You don't have permission to edit categories.")
             return redirect('inventory:category_list')
 
-        category = get_object_or_404(Category, pk=pk, company_id=company_id)
+        category = get_object_or_404(Category.objects.for_company(company_id), pk=pk)
         form = CategoryForm(request.POST, request.FILES, instance=category)
 
         if form.is_valid():
             category = form.save(commit=False)
             category.company_id = company_id
-            category.save()
+            with write_atomic():
+                category.save()
 
             messages.success(request, "Category updated successfully.")
             return redirect('inventory:category_list')
@@ -97,7 +102,7 @@ class CategoryDelete(View):
             messages.error(request, "You don't have permission to delete categories.")
             return redirect('inventory:category_list')
 
-        category = get_object_or_404(Category, pk=pk, company_id=company_id)
+        category = get_object_or_404(Category.objects.for_company(company_id), pk=pk)
         category.delete()
 
         messages.success(request, "Category deleted successfully.")
@@ -111,9 +116,9 @@ class ProductList(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        category = get_object_or_404(Category, id=pk, company_id=company_id)
+        category = get_object_or_404(Category.objects.for_company(company_id), id=pk)
 
-        products = Product.objects.filter(category=category, company_id=company_id)
+        products = Product.objects.for_company(company_id).with_stock().filter(category=category)
 
         return render(request, 'product_list.html', {
             'category': category,
@@ -126,7 +131,7 @@ class ProductDetail(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id).with_stock(), pk=pk)
 
         next_page = request.GET.get("next", "all_products")
         category_id = request.GET.get("category_id", "")
@@ -152,7 +157,7 @@ class ProductCreate(View):
         category_id = request.GET.get("category_id")
 
         form = ProductForm(initial={'category': category_id} if category_id else None)
-        form.fields['category'].queryset = Category.objects.filter(company_id=company_id)
+        form.fields['category'].queryset = Category.objects.for_company(company_id)
 
         return render(request, 'product_form.html', {
             'form': form,
@@ -172,13 +177,14 @@ class ProductCreate(View):
         form = ProductForm(request.POST, request.FILES)
         next_page = request.POST.get("next")
         category_id = request.POST.get("category_id")
-        form.fields['category'].queryset = Category.objects.filter(company_id=company_id)
+        form.fields['category'].queryset = Category.objects.for_company(company_id)
 
         if form.is_valid():
             product = form.save(commit=False)
             product.company_id = company_id
             product.created_by = request.user
-            product.save()
+            with write_atomic():
+                product.save()
 
             messages.success(request, "Product added successfully.")
 
@@ -203,7 +209,7 @@ class ProductDelete(View):
             messages.error(request, "You don't have permission to delete products.")
             return redirect('inventory:all_products')
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id), pk=pk)
 
         next_page = request.POST.get("next", None)
         category_id = request.POST.get("category_id", None)
@@ -222,14 +228,14 @@ class ProductUpdate(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id), pk=pk)
 
         if role == 'Staff':
             messages.error(request, "You can't edit full product details.")
             return redirect('inventory:product_stock', pk=product.pk)
 
-        form = ProductForm(instance=product)
-        form.fields['category'].queryset = Category.objects.filter(company_id=company_id)
+        form = ProductForm(instance=product, initial={'stock': product.current_stock})
+        form.fields['category'].queryset = Category.objects.for_company(company_id)
 
         return render(request, 'product_form.html', {
             'form': form,
@@ -241,19 +247,24 @@ class ProductUpdate(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id), pk=pk)
 
         if role == 'Staff':
             messages.error(request, "You can't edit full product details.")
             return redirect('inventory:product_stock', pk=product.pk)
 
         form = ProductForm(request.POST, request.FILES, instance=product)
-        form.fields['category'].queryset = Category.objects.filter(company_id=company_id)
+        form.fields['category'].queryset = Category.objects.for_company(company_id)
 
         if form.is_valid():
             product = form.save(commit=False)
             product.company_id = company_id
-            product.save()
+            with write_atomic():
+                # the stock snapshot is only changed by compaction; the new
+                # stock goes in as an adjustment instead
+                product.save(update_fields=[
+                    field for field in ProductForm.Meta.fields if field != 'stock'] + ['company', 'updated_at'])
+                set_stock(company_id, product.id, form.cleaned_data['stock'], user=request.user)
 
             messages.success(request, "Product updated successfully.")
             return redirect('inventory:product_detail', pk=pk)
@@ -270,9 +281,9 @@ class StockUpdate(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id).with_stock(), pk=pk)
 
-        form = StockForm(instance=product)
+        form = StockForm(instance=product, initial={'stock': product.current_stock})
         return render(request, 'stock_form.html', {
             'form': form,
             'product': product,
@@ -283,12 +294,12 @@ class StockUpdate(View):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
+        product = get_object_or_404(Product.objects.for_company(company_id).with_stock(), pk=pk)
 
         form = StockForm(request.POST, instance=product)
 
         if form.is_valid():
-            form.save()
+            set_stock(company_id, product.id, form.cleaned_data['stock'], user=request.user)
             messages.success(request, "Stock updated successfully.")
             return redirect('inventory:product_detail', pk=pk)
 
@@ -302,9 +313,8 @@ class IncreaseStock(View):
     def get(self, request, pk):
         company_id = get_user_company(request)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
-        product.stock += 1
-        product.save()
+        product = get_object_or_404(Product.objects.for_company(company_id), pk=pk)
+        record_stock_movements(company_id, {product.id: 1}, 'Increase', user=request.user)
 
         return redirect('inventory:stock_update', pk=pk)
 
@@ -313,20 +323,23 @@ class DecreaseStock(View):
     def get(self, request, pk):
         company_id = get_user_company(request)
 
-        product = get_object_or_404(Product, pk=pk, company_id=company_id)
-        if product.stock > 0:
-            product.stock -= 1
-            product.save()
+        product = get_object_or_404(Product.objects.for_company(company_id), pk=pk)
+        try:
+            record_stock_movements(company_id, {product.id: -1}, 'Decrease', user=request.user)
+        except InsufficientStock:
+            messages.error(request, "This product is out of stock.")
 
         return redirect('inventory:stock_update', pk=pk)
 
 
 class AllproductsList(View):
+    replica_reads = True
+
     def get(self, request):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
 
-        products = Product.objects.filter(company_id=company_id)
+        products = paginate(request, Product.objects.for_company(company_id).with_stock())
 
         return render(request, 'all_product_list.html', {
             'products': products,
@@ -42,22 +42,36 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.CompanyMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'minicrm.urls'
 import os
+import tempfile
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # times renders for RequestMetricsMiddleware's Server-Timing header
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR,'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # compiled templates are kept between requests in development too;
+            # the autoreloader clears them when a template changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -78,9 +92,63 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # the file is in WAL mode (core migration 0008), so reads continue
+        # while one worker writes; NORMAL sync is durable across crashes of
+        # the app (only an OS crash can drop the last commits); 64MB page
+        # cache and 256MB of the file memory-mapped
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # take the write lock at BEGIN, so a transaction that started as a
+            # read can't fail with "database is locked" when it first writes
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# sessions are read from a file cache shared by the workers on a host and
+# written through to django_session when they change (core.sessions);
+# `manage.py clearsessions` purges expired rows in chunks
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SESSION_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'minicrm-sessions')),
+    },
+}
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# read replicas for list, dashboard and search views (replica_reads = True),
+# e.g. DATABASE_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3 kept
+# current by `manage.py sync_replicas --interval 10`. Other standbys can be
+# added to DATABASES and listed here by alias
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(','))):
+    alias = 'replica%d' % (number + 1)
+    DATABASES[alias] = dict(DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# a session that wrote reads from the primary for this long
+REPLICA_PIN_SECONDS = 30
+
+# threads (each with its own connection) that async views use to run their
+# independent queries at the same time; 0 runs them one after another
+ASYNC_QUERY_WORKERS = 4
+
+# short write transactions (core.writes.write_atomic) queue in arrival order
+# instead of racing for SQLite's lock
+SQLITE_WRITE_QUEUE = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,11 +190,76 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic (run through `manage.py build_static`) copies only the files
+# templates load, with fingerprinted names and .gz/.br variants
+STATICFILES_FINDERS = [
+    'core.staticfiles.ReferencedFilesFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+]
 
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+    # request profiles: outside MEDIA_ROOT, only served by the admin-only download view
+    'private': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.environ.get('PRIVATE_MEDIA_ROOT', os.path.join(BASE_DIR, 'private')),
+        },
+    },
+}
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# how long the rendered navigation fragments of base.html are kept; they are
+# keyed by role and by a per-company token (accounts.utils.invalidate_layout)
+LAYOUT_CACHE_TIMEOUT = 60 * 60
+
+# requests over either budget are written to the slow request log, with the
+# SQL statements they repeated most. The log is SLOW_REQUEST_LOG, or a file
+# under the system temp dir, so it stays out of the project tree
+SLOW_REQUEST_QUERY_BUDGET = 50
+SLOW_REQUEST_TIME_BUDGET_MS = 500
+
+# Prometheus text at /core/metrics/, for scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>"; with no token set it is closed. METRICS_ALLOWED_IPS (comma
+# separated) lets scrapers on those addresses in without the token; keep it empty
+# behind a reverse proxy on the same host, where every request comes from
+# 127.0.0.1. Workers share counters through files in METRICS_DIR (defaults to a
+# directory under the system temp dir, it must not be shared between hosts).
+METRICS_ALLOWED_IPS = [address for address in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if address]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.FileHandler',
+            'filename': os.environ.get(
+                'SLOW_REQUEST_LOG', os.path.join(tempfile.gettempdir(), 'minicrm-slow_requests.log')),
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'minicrm.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -15,9 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path,include
+from django.urls import path,include,re_path
 from django.conf.urls.static import static
 from django.conf import settings
+from core.views import ContentMediaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,6 +27,8 @@ urlpatterns = [
     path('customers/', include('customers.urls')),
     path('inventory/',include('inventory.urls')),
     path('transaction/',include('transaction.urls')),
+    # content-addressed uploads and their variants never change once written
+    re_path(r'^%s(?P<path>(?:variants/\w+/)?cas/.+)$' % settings.MEDIA_URL.lstrip('/'), ContentMediaView.as_view()),
 
 ]
 
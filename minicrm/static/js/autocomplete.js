@@ -0,0 +1,76 @@
+(function () {
+    var url = "/core/autocomplete/";
+    var counter = 0;
+
+    function bind(input) {
+        if (input.dataset.autocompleteBound) {
+            return;
+        }
+        input.dataset.autocompleteBound = "1";
+
+        var list = document.createElement("datalist");
+        list.id = "autocomplete-list-" + (++counter);
+        input.setAttribute("list", list.id);
+        input.setAttribute("autocomplete", "off");
+        input.parentNode.appendChild(list);
+
+        var timer = null;
+        var request = 0;
+
+        input.addEventListener("input", function () {
+            var query = input.value.trim();
+            var option = list.querySelector('option[value="' + CSS.escape(input.value) + '"]');
+            if (option) {
+                choose(input, option.dataset.id);
+                return;
+            }
+            clearTimeout(timer);
+            if (!query) {
+                list.innerHTML = "";
+                return;
+            }
+            timer = setTimeout(function () {
+                var current = ++request;
+                var params = new URLSearchParams({q: query});
+                if (input.dataset.autocomplete) {
+                    params.set("type", input.dataset.autocomplete);
+                }
+                fetch(url + "?" + params.toString(), {credentials: "same-origin"})
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        if (current !== request) {
+                            return;
+                        }
+                        list.innerHTML = "";
+                        data.results.forEach(function (result) {
+                            var item = document.createElement("option");
+                            item.value = result.label;
+                            item.dataset.id = result.id;
+                            list.appendChild(item);
+                        });
+                    });
+            }, 150);
+        });
+    }
+
+    function choose(input, id) {
+        var select = input.dataset.target
+            ? document.querySelector(input.dataset.target)
+            : input.parentNode.querySelector("select");
+        if (!select || !select.querySelector('option[value="' + id + '"]')) {
+            return;
+        }
+        select.value = id;
+        select.dispatchEvent(new Event("change"));
+    }
+
+    function bindAll(root) {
+        root.querySelectorAll("input[data-autocomplete]").forEach(bind);
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        bindAll(document);
+        new MutationObserver(function () { bindAll(document); })
+            .observe(document.body, {childList: true, subtree: true});
+    });
+})();
@@ -1,9 +1,10 @@
 from django.contrib import admin
 
-from transaction.models import Service,OrderItem,Order
+from transaction.models import Service,OrderItem,Order,DailySales
 
 
 
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(Service)
+admin.site.register(DailySales)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from transaction.utils import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-company daily sales rollups from the orders table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help="Only rebuild this company id")
+
+    def handle(self, *args, **options):
+        count = rebuild_daily_sales(options['company'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt %d daily sales rows." % count))
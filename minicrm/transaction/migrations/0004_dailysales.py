@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    Order = apps.get_model('transaction', 'Order')
+    DailySales = apps.get_model('transaction', 'DailySales')
+    totals = (Order.objects.annotate(day=TruncDate('created_at'))
+              .values('company_id', 'day')
+              .annotate(orders=Count('id'), revenue=Sum('total_amount'), profit=Sum('total_profit'),
+                        pending=Count('id', filter=Q(status='Pending'))))
+    DailySales.objects.bulk_create([DailySales(**row) for row in totals], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transaction', '0003_service_lead_alter_service_customer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.FloatField(default=0)),
+                ('profit', models.FloatField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.company')),
+            ],
+            options={
+                'unique_together': {('company', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
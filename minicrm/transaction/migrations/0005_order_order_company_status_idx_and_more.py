@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_company_data_version'),
+        ('customers', '0004_lead_lead_company_created_idx'),
+        ('inventory', '0003_product_product_out_of_stock_idx'),
+        ('transaction', '0004_dailysales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['company', 'status', '-id'], name='order_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['company', 'status', '-id'], name='service_company_status_idx'),
+        ),
+    ]
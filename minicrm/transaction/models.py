@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from accounts.models import Company
+from accounts.models import Company, CompanyQuerySet
 from inventory.models import Product
 from customers.models import Customer,Lead
 
@@ -8,6 +8,8 @@ ORDER_STATUS = (
     ('Pending', 'Pending'),
     ('Completed', 'Completed'),)
 
+ROLLUP_FIELDS = ('company_id', 'created_at', 'status', 'total_amount', 'total_profit')
+
 
 class Order(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
@@ -18,10 +20,45 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=ORDER_STATUS, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'status', '-id'], name='order_company_status_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # the row as loaded, so saving or deleting it later can take its
+        # totals out of the right daily rollup (see transaction.signals)
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_values = instance.rollup_values()
+        return instance
+
+    def rollup_values(self):
+        if self.pk is None or self.get_deferred_fields() & set(ROLLUP_FIELDS):
+            return None
+        return tuple(getattr(self, field) for field in ROLLUP_FIELDS)
+
     def __str__(self):
         return self.customer.name
 
 
+class DailySales(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    revenue = models.FloatField(default=0)
+    profit = models.FloatField(default=0)
+    pending = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('company', 'day')
+
+    def __str__(self):
+        return "%s %s" % (self.company_id, self.day)
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
@@ -46,5 +83,12 @@ class Service(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='service_created_by')
     status = models.CharField(max_length=20, choices=ORDER_STATUS, default="Pending")
 
+    objects = CompanyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'status', '-id'], name='service_company_status_idx'),
+        ]
+
     def __str__(self):
         return self.customer.name if self.customer else self.lead.name
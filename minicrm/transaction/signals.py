@@ -0,0 +1,67 @@
+from django.db import IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.db.transaction import atomic
+from django.dispatch import receiver
+from django.utils import timezone
+from transaction.models import Order, DailySales
+
+# DailySales is kept up to date from Order saves and deletes. Queryset
+# update() and bulk writes on Order skip these signals, so after one run
+# rebuild_daily_sales (manage.py rebuild_sales_rollups) for the company
+
+
+def rollup_state(values):
+    if values is None:
+        return None
+    company_id, created_at, status, total_amount, total_profit = values
+    if created_at is None:
+        return None
+    day = timezone.localtime(created_at).date()
+    return (company_id, day), (1, total_amount, total_profit, 1 if status == 'Pending' else 0)
+
+
+def add_to_rollup(key, values, create=True):
+    company_id, day = key
+    orders, revenue, profit, pending = values
+    rollup = DailySales.objects.filter(company_id=company_id, day=day)
+    changes = {
+        'orders': F('orders') + orders,
+        'revenue': F('revenue') + revenue,
+        'profit': F('profit') + profit,
+        'pending': F('pending') + pending,
+    }
+
+    if rollup.update(**changes) or not create:
+        return
+    try:
+        with atomic():
+            DailySales.objects.create(company_id=company_id, day=day, orders=orders, revenue=revenue,
+                                      profit=profit, pending=pending)
+    except IntegrityError:
+        rollup.update(**changes)
+
+
+@receiver(post_save, sender=Order)
+def update_rollup_on_save(sender, instance, **kwargs):
+    values = instance.rollup_values()
+    previous = rollup_state(getattr(instance, '_rollup_values', None))
+    current = rollup_state(values)
+    instance._rollup_values = values
+    if previous == current:
+        return
+
+    if previous and current and previous[0] == current[0]:
+        add_to_rollup(current[0], [new - old for new, old in zip(current[1], previous[1])])
+    else:
+        if previous:
+            add_to_rollup(previous[0], [-value for value in previous[1]], create=False)
+        if current:
+            add_to_rollup(*current)
+
+
+@receiver(post_delete, sender=Order)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    state = rollup_state(getattr(instance, '_rollup_values', None))
+    if state:
+        add_to_rollup(state[0], [-value for value in state[1]], create=False)
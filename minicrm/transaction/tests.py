@@ -1,3 +1,230 @@
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
 from django.test import TestCase
+from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from accounts.models import Company
+from core.models import Job
+from core.testing import CompanyTestMixin, QueryPlanMixin
+from customers.models import Customer
+from inventory.models import Category, Product, StockMovement
+from transaction.models import DailySales, Order, OrderItem, Service
+from transaction.utils import rebuild_daily_sales
 
-# Create your tests here.
+
+class RelationLoadingTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Cases', company=self.company)
+        self.product = Product.objects.create(
+            name='Case', category=category, source='Bought', buying_price=5, selling_price=10,
+            stock=100, company=self.company)
+        self.client.get('/transaction/orders/')
+
+    def add_rows(self, count):
+        for x in range(count):
+            customer = Customer.objects.create(
+                name='Customer %d' % x, email='c%d@example.com' % x, phone='1', address='Street',
+                company=self.company)
+            order = Order.objects.create(company=self.company, customer=customer, created_by=self.user)
+            Service.objects.create(
+                company=self.company, customer=customer, product=self.product, description='Repair',
+                service_type='Repair', service_date='2025-01-01', created_by=self.user, status='Completed')
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertBoundedQueries(self, url):
+        self.add_rows(1)
+        few = self.count_queries(url)
+        self.add_rows(10)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_order_list(self):
+        self.assertBoundedQueries('/transaction/orders/')
+
+    def test_order_list_survives_tampered_cursor(self):
+        self.assertEqual(self.client.get('/transaction/orders/?after=WyJhYmMiXQ==').status_code, 200)
+
+    def test_pending_order_list(self):
+        self.assertBoundedQueries('/transaction/orders_pending/')
+
+    def test_service_list(self):
+        self.assertBoundedQueries('/transaction/services/')
+
+    def test_completed_service_list(self):
+        self.assertBoundedQueries('/transaction/services-completed/')
+
+    def test_order_detail(self):
+        order = self.add_rows(1)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, selling_price=10)
+        # the first detail page fills the per-company caches
+        self.count_queries('/transaction/orders/%d/' % order.id)
+        few = self.count_queries('/transaction/orders/%d/' % order.id)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.product, quantity=1, selling_price=10) for x in range(10)])
+        self.assertEqual(self.count_queries('/transaction/orders/%d/' % order.id), few)
+
+
+class OrderWriteTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = Customer.objects.create(
+            name='Jane', email='jane@example.com', phone='1', address='Street', company=self.company)
+        category = Category.objects.create(name='Cases', company=self.company)
+        self.products = Product.objects.bulk_create([
+            Product(name='Case %d' % x, category=category, source='Bought', buying_price=5, selling_price=10,
+                    stock=100, company=self.company)
+            for x in range(12)])
+
+        # fills the per-company caches so every measured request starts warm
+        self.post_order('/transaction/orders_add/', [(self.products[-1], 1)])
+        warm = Order.objects.get()
+        self.post_order('/transaction/orders_edit/%d/' % warm.id, [(self.products[-1], 2)])
+
+    def post_order(self, url, lines):
+        return self.client.post(url, {
+            'customer': self.customer.id,
+            'status': 'Pending',
+            'product': [product.id for product, quantity in lines],
+            'quantity': [quantity for product, quantity in lines],
+            'selling_price': [10 for line in lines],
+        })
+
+    def count_queries(self, url, lines):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_order(url, lines)
+        self.assertEqual(response.status_code, 302)
+        return len(context.captured_queries)
+
+    def movements(self, order=None):
+        totals = {}
+        for movement in StockMovement.objects.filter(order=order):
+            totals[movement.product_id] = totals.get(movement.product_id, 0) + movement.delta
+        return totals
+
+    def test_add_query_count_does_not_grow_with_lines(self):
+        few = self.count_queries('/transaction/orders_add/', [(self.products[0], 1)])
+        many = self.count_queries('/transaction/orders_add/', [(product, 2) for product in self.products])
+        self.assertEqual(many, few)
+
+        order = Order.objects.latest('id')
+        self.assertEqual(order.items.count(), 12)
+        self.assertEqual(order.total_amount, 240)
+        self.assertEqual(self.movements(order), {product.id: -2 for product in self.products})
+
+    def test_update_query_count_does_not_grow_with_lines(self):
+        self.post_order('/transaction/orders_add/', [(self.products[0], 1)])
+        small = Order.objects.latest('id')
+        self.post_order('/transaction/orders_add/', [(product, 1) for product in self.products])
+        large = Order.objects.latest('id')
+
+        few = self.count_queries('/transaction/orders_edit/%d/' % small.id, [(self.products[0], 2)])
+        many = self.count_queries('/transaction/orders_edit/%d/' % large.id,
+                                  [(product, 2) for product in self.products])
+        self.assertEqual(many, few)
+
+    def test_update_applies_net_movements(self):
+        first, second, third = self.products[:3]
+        self.post_order('/transaction/orders_add/', [(first, 5), (second, 3)])
+        order = Order.objects.latest('id')
+        item_ids = dict(order.items.values_list('product_id', 'id'))
+
+        # two units move from the first product to a new line, the second line goes
+        self.post_order('/transaction/orders_edit/%d/' % order.id, [(first, 3), (third, 2)])
+
+        self.assertEqual(self.movements(order), {first.id: -3, second.id: 0, third.id: -2})
+        self.assertEqual(StockMovement.objects.filter(order=order, reason='OrderUpdate').count(), 3)
+        items = dict(order.items.values_list('product_id', 'quantity'))
+        self.assertEqual(items, {first.id: 3, third.id: 2})
+        self.assertEqual(order.items.get(product=first).id, item_ids[first.id])
+
+        stock = {product.id: product.current_stock
+                 for product in Product.objects.with_stock().filter(id__in=[first.id, second.id, third.id])}
+        self.assertEqual(stock, {first.id: 97, second.id: 100, third.id: 98})
+
+    def test_update_without_changes_moves_no_stock(self):
+        self.post_order('/transaction/orders_add/', [(self.products[0], 5)])
+        order = Order.objects.latest('id')
+        self.post_order('/transaction/orders_edit/%d/' % order.id, [(self.products[0], 5)])
+        self.assertEqual(StockMovement.objects.filter(order=order, reason='OrderUpdate').count(), 0)
+
+
+class OrderDeleteTest(CompanyTestMixin, TestCase):
+    def test_order_delete_restores_stock_with_the_delete(self):
+        category = Category.objects.create(name='Cases', company=self.company)
+        product = Product.objects.create(name='Case', category=category, source='Bought', selling_price=10,
+                                         company=self.company)
+        order = Order.objects.create(company=self.company, created_by=self.user)
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+
+        self.client.get('/transaction/orders_delete/%d/' % order.id)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Product.objects.get().current_stock, 3)
+
+
+class SalesRollupTest(CompanyTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Company.objects.create(name='Other', address='Street', phone=2, owner=self.user)
+
+    def rollups(self):
+        return sorted(DailySales.objects.values_list('company_id', 'day', 'orders', 'revenue', 'profit', 'pending'))
+
+    def assertMatchesRecompute(self):
+        incremental = [row for row in self.rollups() if row[2]]
+        rebuild_daily_sales()
+        self.assertEqual(incremental, self.rollups())
+
+    def test_writes_keep_rollups_equal_to_a_recompute(self):
+        first = Order.objects.create(company=self.company, total_amount=100, total_profit=20)
+        second = Order.objects.create(company=self.company, total_amount=50, total_profit=5, status='Completed')
+        Order.objects.create(company=self.other, total_amount=10, total_profit=1)
+        self.assertMatchesRecompute()
+
+        first = Order.objects.get(pk=first.pk)
+        first.total_amount, first.status = 120, 'Completed'
+        first.save()
+        self.assertMatchesRecompute()
+
+        # moving an order to another day takes it out of the first day's row
+        second = Order.objects.get(pk=second.pk)
+        second.created_at -= timedelta(days=3)
+        second.save()
+        self.assertMatchesRecompute()
+
+        Order.objects.get(pk=first.pk).delete()
+        self.assertMatchesRecompute()
+        self.assertFalse(DailySales.objects.filter(company=self.company, day=timezone.localdate()).exists())
+
+    def test_loading_orders_does_no_rollup_work(self):
+        Order.objects.create(company=self.company, total_amount=100, total_profit=20)
+        with patch('transaction.signals.timezone.localtime') as localtime:
+            list(Order.objects.all())
+        localtime.assert_not_called()
+
+    def test_rebuild_invalidates_dashboard_cache(self):
+        version = Company.objects.get(pk=self.company.pk).data_version
+        Order.objects.filter(company=self.company).update(total_amount=1)
+        rebuild_daily_sales(self.company.id)
+        self.assertEqual(Company.objects.get(pk=self.company.pk).data_version, version + 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'plans are SQLite EXPLAIN QUERY PLAN output')
+class QueryPlanTest(CompanyTestMixin, QueryPlanMixin, TestCase):
+    def test_order_status(self):
+        self.assertUsesIndex(
+            Order.objects.for_company(self.company.id).filter(status='Pending').order_by('-id')[:31],
+            'order_company_status_idx')
+
+    def test_service_status(self):
+        self.assertUsesIndex(
+            Service.objects.for_company(self.company.id).filter(status='Completed').order_by('-id')[:31],
+            'service_company_status_idx')
@@ -0,0 +1,39 @@
+from django.db.models import Count, F, Sum, Q
+from django.db.models.functions import TruncDate
+from django.db.transaction import atomic
+from accounts.models import Company
+from transaction.models import Order, DailySales
+
+
+def get_order_lines(request):
+    product_ids = request.POST.getlist('product')
+    quantities = request.POST.getlist('quantity')
+    selling_prices = request.POST.getlist('selling_price')
+
+    lines = []
+    for product_id, quantity, selling_price in zip(product_ids, quantities, selling_prices):
+        if not product_id or not quantity or not selling_price:#skip
+            continue
+        lines.append((int(product_id), int(quantity), float(selling_price)))
+    return lines
+
+
+def rebuild_daily_sales(company_id=None):
+    orders = Order.objects.all()
+    rollups = DailySales.objects.all()
+    if company_id:
+        orders = orders.filter(company_id=company_id)
+        rollups = rollups.filter(company_id=company_id)
+
+    totals = (orders.annotate(day=TruncDate('created_at'))
+              .values('company_id', 'day')
+              .annotate(orders=Count('id'), revenue=Sum('total_amount'), profit=Sum('total_profit'),
+                        pending=Count('id', filter=Q(status='Pending'))))
+
+    with atomic():
+        rollups.delete()
+        DailySales.objects.bulk_create([DailySales(**row) for row in totals], batch_size=500)
+        # the dashboard caches its totals per data version
+        companies = Company.objects.filter(id=company_id) if company_id else Company.objects.all()
+        companies.update(data_version=F('data_version') + 1)
+    return len(totals)
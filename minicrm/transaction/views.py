@@ -1,20 +1,31 @@
+from collections import defaultdict
+from functools import partial
 from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from django.views import View
 from django.contrib import messages
+from core.writes import write_atomic
+from core.queries import gather_queries
 from accounts.utils import get_user_company, get_user_role
+from core.pagination import paginate
 from transaction.models import Order, OrderItem, Service
 from customers.models import Customer,Lead
 from transaction.forms import OrderForm, OrderItemForm, ServiceForm
 from inventory.models import Product
+from inventory.utils import InsufficientStock, record_stock_movements
+from transaction.utils import get_order_lines
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 
 
 class OrderList(View):
+    replica_reads = True
+
     def get(self, request):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
-        orders = Order.objects.filter(company_id=company_id).order_by('-id')
+        orders = paginate(request, Order.objects.for_company(company_id).select_related('customer'))
         return render(request, 'order_list.html', {'orders': orders, 'role': role})
 
 
@@ -24,9 +35,10 @@ class PendingOrderList(View):
         role = get_user_role(request, company_id)
 
         if role in ['Admin', 'Manager']:
-            orders = Order.objects.filter(company_id=company_id, status="Pending").order_by('-id')
+            orders = Order.objects.for_company(company_id).filter(status="Pending")
         else:
-            orders = Order.objects.filter(company_id=company_id, status="Pending", created_by=request.user).order_by('-id')
+            orders = Order.objects.for_company(company_id).filter(status="Pending", created_by=request.user)
+        orders = paginate(request, orders.select_related('customer'))
 
         return render(request, 'pending_order.html', {'orders': orders, 'role': role})
 
@@ -36,11 +48,11 @@ class OrderAdd(View):
         company_id = get_user_company(request)
 
         form = OrderForm()
-        form.fields['customer'].queryset = Customer.objects.filter(company_id=company_id)
+        form.fields['customer'].queryset = Customer.objects.for_company(company_id)
         item_form = OrderItemForm()
 
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id).with_stock()
 
         return render(request, 'order_form.html', {
             'form': form,
@@ -53,9 +65,9 @@ class OrderAdd(View):
         role = get_user_role(request, company_id)
 
         form = OrderForm(request.POST)
-        form.fields['customer'].queryset = Customer.objects.filter(company_id=company_id)
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        form.fields['customer'].queryset = Customer.objects.for_company(company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id).with_stock()
 
         if not form.is_valid():
             messages.error(request, "Error creating order.")
@@ -65,42 +77,33 @@ class OrderAdd(View):
                 'products': products
             })
 
-        order = form.save(commit=False)
-        order.company_id = company_id
-        order.created_by = request.user
-        order.total_amount = 0
-        order.total_profit = 0
-        order.save()
-
-        product_ids = request.POST.getlist('product')
-        quantities = request.POST.getlist('quantity')
-        selling_prices = request.POST.getlist('selling_price')
-
-        if not product_ids or not quantities:
+        lines = get_order_lines(request)
+        if not lines:
             messages.error(request, "Please add at least one product.")
-            order.delete()
             return render(request, 'order_form.html', {
                 'form': form,
                 'customers': customers,
                 'products': products
             })
 
-        for i in range(len(product_ids)):
-            product_id = product_ids[i]
-            quantity = quantities[i]
-            selling_price = selling_prices[i]
-
-            if not product_id or not quantity or not selling_price:#skip
-                continue
+        product_ids = {product_id for product_id, quantity, selling_price in lines}
+        order_products = Product.objects.for_company(company_id).in_bulk(product_ids)
+        if len(order_products) != len(product_ids):
+            raise Http404("No Product matches the given query.")
 
-            product = get_object_or_404(Product, id=product_id, company_id=company_id)
-            quantity = int(quantity)
-            selling_price = float(selling_price)
+        order = form.save(commit=False)
+        order.company_id = company_id
+        order.created_by = request.user
+        order.total_amount = 0
+        order.total_profit = 0
 
+        items = []
+        stock_deltas = defaultdict(int)
+        for product_id, quantity, selling_price in lines:
+            product = order_products[product_id]
 
             if role != 'Admin' and selling_price < product.min_selling_price:
                 messages.error(request, " cannot sell below minimum price")
-                order.delete()
                 return render(request, 'order_form.html', {
                     'form': form,
                     'customers': customers,
@@ -110,33 +113,43 @@ class OrderAdd(View):
             cost_price = product.buying_price or product.manufacture_price or 0
             profit = (selling_price - cost_price) * quantity
 
-            OrderItem.objects.create(
+            items.append(OrderItem(
                 order=order,
                 product=product,
                 quantity=quantity,
                 selling_price=selling_price,
                 profit=profit
-            )
-
-            product.stock -= quantity
-            product.save()
+            ))
+            stock_deltas[product_id] -= quantity
 
             order.total_amount += selling_price * quantity
             order.total_profit += profit
 
-        order.save()
+        try:
+            with write_atomic():
+                order.save()
+                OrderItem.objects.bulk_create(items)
+                record_stock_movements(company_id, stock_deltas, 'Order', order=order, user=request.user)
+        except InsufficientStock:
+            messages.error(request, "Not enough stock for the selected products.")
+            return render(request, 'order_form.html', {
+                'form': form,
+                'customers': customers,
+                'products': products
+            })
+
         messages.success(request, "Order created successfully!")
         return redirect('transaction:order_list')
 
 class OrderUpdate(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        order = get_object_or_404(Order, id=i, company_id=company_id)
+        order = get_object_or_404(Order.objects.for_company(company_id), id=i)
         form = OrderForm(instance=order)
-        form.fields['customer'].queryset = Customer.objects.filter(company_id=company_id)
+        form.fields['customer'].queryset = Customer.objects.for_company(company_id)
         item_form = OrderItemForm()
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id).with_stock()
         return render(request, 'order_form.html', {
             'form': form,
             'order': order,
@@ -147,11 +160,11 @@ class OrderUpdate(View):
     def post(self, request, i):
         company_id = get_user_company(request)
         role = get_user_role(request, company_id)
-        order = get_object_or_404(Order, id=i, company_id=company_id)
+        order = get_object_or_404(Order.objects.for_company(company_id), id=i)
         form = OrderForm(request.POST, instance=order)
-        form.fields['customer'].queryset = Customer.objects.filter(company_id=company_id)
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        form.fields['customer'].queryset = Customer.objects.for_company(company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id).with_stock()
 
         if not form.is_valid():
             messages.error(request, "Error updating order.")
@@ -161,23 +174,8 @@ class OrderUpdate(View):
                 'customers': customers,
                 'products': products })
 
-        order = form.save(commit=False)
-        order.save()
-
-        for item in order.items.all():
-            item.product.stock += item.quantity
-            item.product.save()
-        order.items.all().delete()
-
-
-        order.total_amount = 0
-        order.total_profit = 0
-
-        product_ids = request.POST.getlist('product')
-        quantities = request.POST.getlist('quantity')
-        selling_prices = request.POST.getlist('selling_price')
-
-        if not product_ids or not quantities:
+        lines = get_order_lines(request)
+        if not lines:
             messages.error(request, "Please add at least one product.")
             return render(request, 'order_form.html', {
                 'form': form,
@@ -185,18 +183,21 @@ class OrderUpdate(View):
                 'customers': customers,
                 'products': products})
 
+        product_ids = {product_id for product_id, quantity, selling_price in lines}
+        order_products = Product.objects.for_company(company_id).in_bulk(product_ids)
+        if len(order_products) != len(product_ids):
+            raise Http404("No Product matches the given query.")
 
-        for x in range(len(product_ids)):
-            product_id = product_ids[x]
-            quantity = quantities[x]
-            selling_price = selling_prices[x]
-
-            if not product_id or not quantity or not selling_price:
-                continue
+        existing_items = defaultdict(list)
+        for item in order.items.all():
+            existing_items[item.product_id].append(item)
 
-            product = get_object_or_404(Product, id=product_id, company_id=company_id)
-            quantity = int(quantity)
-            selling_price = float(selling_price)
+        new_items = []
+        changed_items = []
+        kept_items = []
+        stock_deltas = defaultdict(int)
+        for product_id, quantity, selling_price in lines:
+            product = order_products[product_id]
 
             if role != 'Admin' and selling_price < product.min_selling_price:
                 messages.error(request, " cannot sell below minimum price")
@@ -208,22 +209,56 @@ class OrderUpdate(View):
 
             cost_price = product.buying_price or product.manufacture_price or 0
             profit = (selling_price - cost_price) * quantity
+            stock_deltas[product_id] -= quantity
+
+            if existing_items[product_id]:
+                item = existing_items[product_id].pop(0)
+                stock_deltas[product_id] += item.quantity
+                if item.quantity != quantity or item.selling_price != selling_price:
+                    item.quantity = quantity
+                    item.selling_price = selling_price
+                    item.profit = profit
+                    changed_items.append(item)
+                kept_items.append(item)
+                continue
 
-            OrderItem.objects.create(
+            item = OrderItem(
                 order=order,
                 product=product,
                 quantity=quantity,
                 selling_price=selling_price,
                 profit=profit
             )
+            new_items.append(item)
+            kept_items.append(item)
 
-            product.stock -= quantity
-            product.save()
+        removed_items = [item for items in existing_items.values() for item in items]
+        for item in removed_items:
+            if item.product_id:
+                stock_deltas[item.product_id] += item.quantity
 
-            order.total_amount += selling_price * quantity
-            order.total_profit += profit
+        order = form.save(commit=False)
+        order.total_amount = sum(item.selling_price * item.quantity for item in kept_items)
+        order.total_profit = sum(item.profit for item in kept_items)
+
+        try:
+            with write_atomic():
+                order.save()
+                if removed_items:
+                    OrderItem.objects.filter(id__in=[item.id for item in removed_items]).delete()
+                if changed_items:
+                    OrderItem.objects.bulk_update(changed_items, ['quantity', 'selling_price', 'profit'])
+                if new_items:
+                    OrderItem.objects.bulk_create(new_items)
+                record_stock_movements(company_id, stock_deltas, 'OrderUpdate', order=order, user=request.user)
+        except InsufficientStock:
+            messages.error(request, "Not enough stock for the selected products.")
+            return render(request, 'order_form.html', {
+                'form': form,
+                'order': order,
+                'customers': customers,
+                'products': products })
 
-        order.save()
         messages.success(request, "Order updated successfully!")
         return redirect('transaction:order_list')
 
@@ -232,13 +267,16 @@ class OrderUpdate(View):
 class OrderDelete(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        order = get_object_or_404(Order, id=i, company_id=company_id)
+        order = get_object_or_404(Order.objects.for_company(company_id), id=i)
 
+        stock_deltas = defaultdict(int)
         for item in order.items.all():
-            item.product.stock += item.quantity
-            item.product.save()
+            if item.product_id:
+                stock_deltas[item.product_id] += item.quantity
 
-        order.delete()
+        with write_atomic():
+            order.delete()
+            record_stock_movements(company_id, stock_deltas, 'OrderDelete', user=request.user)
         messages.success(request, "Order deleted successfully!")
         return redirect('transaction:order_list')
 
@@ -246,7 +284,10 @@ class OrderDelete(View):
 class OrderDetail(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        order = get_object_or_404(Order, id=i, company_id=company_id)
+        order = get_object_or_404(
+            Order.objects.for_company(company_id).select_related('customer', 'created_by').prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product'))),
+            id=i)
         role = get_user_role(request, company_id)
         return render(request, 'order_detail.html', {'order': order, 'role': role})
 
@@ -256,38 +297,47 @@ class ServiceList(View):
     def get(self, request):
         company_id = get_user_company(request)
 
-        services = Service.objects.filter(company_id=company_id).order_by('-id')
+        services = paginate(request, Service.objects.for_company(company_id).select_related('customer', 'product'))
 
         return render(request, 'service_list.html', {'services': services})
 
 
 
 class ServiceAdd(View):
-    def get(self, request):
+    async def get(self, request):
         company_id = get_user_company(request)
 
         form = ServiceForm()
 
-        form.fields["customer"].queryset = Customer.objects.filter(company_id=company_id)
-        form.fields["lead"].queryset = Lead.objects.filter(company_id=company_id).filter(Q(status="New") | Q(status="Contacted"))
-        form.fields["product"].queryset = Product.objects.filter(company_id=company_id)
+        form.fields["customer"].queryset = Customer.objects.for_company(company_id)
+        form.fields["lead"].queryset = Lead.objects.for_company(company_id).filter(Q(status="New") | Q(status="Contacted"))
+        form.fields["product"].queryset = Product.objects.for_company(company_id)
         form.fields["assigned_to"].queryset = User.objects.filter(
             is_superuser=False,
             companyuser__company_id=company_id,
             companyuser__status="Approved"
         )
 
-        return render(request, "service_form.html", {"form": form})
+        # the fields' own choices, with their queries run at the same time
+        fields = [form.fields[name] for name in ("customer", "lead", "product", "assigned_to")]
+        choices = await gather_queries(*(partial(list, field.choices) for field in fields))
+        for field, field_choices in zip(fields, choices):
+            field.choices = field_choices
 
-    def post(self, request):
+        return await sync_to_async(render)(request, "service_form.html", {"form": form})
+
+    async def post(self, request):
+        return await sync_to_async(self.add_service)(request)
+
+    def add_service(self, request):
         company_id = get_user_company(request)
 
         form = ServiceForm(request.POST)
 
 
-        form.fields["customer"].queryset = Customer.objects.filter(company_id=company_id)
-        form.fields["lead"].queryset = Lead.objects.filter(company_id=company_id).filter(Q(status="New") | Q(status="Contacted"))
-        form.fields["product"].queryset = Product.objects.filter(company_id=company_id)
+        form.fields["customer"].queryset = Customer.objects.for_company(company_id)
+        form.fields["lead"].queryset = Lead.objects.for_company(company_id).filter(Q(status="New") | Q(status="Contacted"))
+        form.fields["product"].queryset = Product.objects.for_company(company_id)
         form.fields["assigned_to"].queryset = User.objects.filter(
             is_superuser=False,
             companyuser__company_id=company_id,
@@ -310,20 +360,20 @@ class ServiceAdd(View):
 class ServiceUpdate(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        service = get_object_or_404(Service, id=i, company_id=company_id)
+        service = get_object_or_404(Service.objects.for_company(company_id), id=i)
         form = ServiceForm(instance=service)
 
-        form.fields["customer"].queryset = Customer.objects.filter(company_id=company_id)
-        form.fields["lead"].queryset = Lead.objects.filter(company_id=company_id).filter(Q(status="New") | Q(status="Contacted"))
-        form.fields["product"].queryset = Product.objects.filter(company_id=company_id)
+        form.fields["customer"].queryset = Customer.objects.for_company(company_id)
+        form.fields["lead"].queryset = Lead.objects.for_company(company_id).filter(Q(status="New") | Q(status="Contacted"))
+        form.fields["product"].queryset = Product.objects.for_company(company_id)
         form.fields["assigned_to"].queryset = User.objects.filter(
             is_superuser=False,
             companyuser__company_id=company_id,
             companyuser__status='Approved'
         )
 
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id)
         return render(request, 'service_form.html', {
             'form': form,
             'service': service,
@@ -333,20 +383,20 @@ class ServiceUpdate(View):
 
     def post(self, request, i):
         company_id = get_user_company(request)
-        service = get_object_or_404(Service, id=i, company_id=company_id)
+        service = get_object_or_404(Service.objects.for_company(company_id), id=i)
         form = ServiceForm(request.POST, instance=service)
 
-        form.fields["customer"].queryset = Customer.objects.filter(company_id=company_id)
-        form.fields["lead"].queryset = Lead.objects.filter(company_id=company_id).filter(Q(status="New") | Q(status="Contacted"))
-        form.fields["product"].queryset = Product.objects.filter(company_id=company_id)
+        form.fields["customer"].queryset = Customer.objects.for_company(company_id)
+        form.fields["lead"].queryset = Lead.objects.for_company(company_id).filter(Q(status="New") | Q(status="Contacted"))
+        form.fields["product"].queryset = Product.objects.for_company(company_id)
         form.fields["assigned_to"].queryset = User.objects.filter(
             is_superuser=False,
             companyuser__company_id=company_id,
             companyuser__status='Approved'
         )
 
-        customers = Customer.objects.filter(company_id=company_id)
-        products = Product.objects.filter(company_id=company_id)
+        customers = Customer.objects.for_company(company_id)
+        products = Product.objects.for_company(company_id)
 
         if form.is_valid():
             form.save()
@@ -365,7 +415,7 @@ class ServiceUpdate(View):
 class ServiceDelete(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        service = get_object_or_404(Service, id=i, company_id=company_id)
+        service = get_object_or_404(Service.objects.for_company(company_id), id=i)
         service.delete()
         messages.success(request, "Service deleted successfully!")
         return redirect('transaction:service_list')
@@ -374,7 +424,7 @@ class ServiceDelete(View):
 class ServiceDetail(View):
     def get(self, request, i):
         company_id = get_user_company(request)
-        service = get_object_or_404(Service, id=i, company_id=company_id)
+        service = get_object_or_404(Service.objects.for_company(company_id), id=i)
         role = get_user_role(request, company_id)
         return render(request, 'service_detail.html', {'service': service, 'role': role})
 
@@ -385,9 +435,9 @@ class CompletedServiceList(View):
         role = get_user_role(request, company_id)
 
         if role in ['Admin', 'Manager']:
-            services = Service.objects.filter(company_id=company_id, status="Completed").order_by('-id')
+            services = Service.objects.for_company(company_id).filter(status="Completed")
         else:
-            services = Service.objects.filter(
-                company_id=company_id, created_by=request.user, status="Completed").order_by('-id')
+            services = Service.objects.for_company(company_id).filter(created_by=request.user, status="Completed")
+        services = paginate(request, services.select_related('customer', 'product'))
 
         return render(request, 'completed_service.html', {'services': services, 'role': role})